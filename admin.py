@@ -28,7 +28,11 @@ def _print_users(users):
     for entry in users:
         uuid = entry.get("uuid", "?")
         name = entry.get("name", "?")
-        print(f"- {name} ({uuid})")
+        outbound = entry.get("outbound") or {}
+        if outbound.get("backlog") or outbound.get("held"):
+            print(f"- {name} ({uuid}) backlog {outbound.get('backlog', 0)}, held {outbound.get('held', 0)}")
+        else:
+            print(f"- {name} ({uuid})")
 
 
 def _request(client: httpx.Client, method: str, path: str, payload=None):
@@ -189,6 +193,26 @@ def save_cache(client: httpx.Client):
         print("Cache save failed.")
 
 
+def backfill_emoji(client: httpx.Client):
+    action = input("Emoji backfill (start/status, default status): ").strip().lower()
+    if action == "start":
+        data = _request(client, "POST", "/admin/cache/backfill-emoji", payload={})
+    elif action in ("", "status", "show"):
+        data = _request(client, "GET", "/admin/cache/backfill-emoji")
+    else:
+        print("Unknown action. Use start or status.")
+        return
+    if not isinstance(data, dict):
+        return
+    state = "running" if data.get("running") else "idle"
+    print(
+        f"Emoji backfill {state}: {data.get('resolved', 0)}/{data.get('missing', '?')} resolved, "
+        f"{data.get('failed', 0)} failed, {data.get('requests_done', 0)}/{data.get('requests_total', '?')} requests"
+    )
+    if data.get("error"):
+        print(f"Last run failed: {data['error']}")
+
+
 def main():
     base_url = os.getenv("ADMIN_URL", DEFAULT_BASE_URL)
     token = os.getenv("ADMIN_TOKEN")
@@ -208,7 +232,8 @@ def main():
             print("5) Broadcast news")
             print("6) Finish current gamemode")
             print("7) Stopwatch controls")
-            print("8) Quit")
+            print("8) Emoji backfill")
+            print("9) Quit")
             choice = input(">> ").strip().lower()
 
             if choice in ("1", "status"):
@@ -225,11 +250,13 @@ def main():
                 finish_gamemode(client)
             elif choice in ("7", "stopwatch", "clock"):
                 control_stopwatch(client)
-            elif choice in ("8", "q", "quit", "exit"):
+            elif choice in ("8", "emoji", "backfill"):
+                backfill_emoji(client)
+            elif choice in ("9", "q", "quit", "exit"):
                 print("Goodbye.")
                 break
             else:
-                print("Unknown option. Use 1-8.")
+                print("Unknown option. Use 1-9.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,126 @@
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from cache import Cache
+from combos import EMOJI_BATCH_SYSTEM_PROMPT, emoji_batch_user_prompt, parse_batch_results, valid_single_emoji
+from llm import LLMClient
+from sqlite_cache import SqliteCache
+
+log = logging.getLogger('EmojiBackfill')
+
+CompleteJson = Callable[[str, str, str], Awaitable[Optional[Dict[str, Any]]]]
+
+
+def items_missing_emoji(cache: Cache) -> List[str]:
+    return [name for name, emoji in cache.item_emojis() if valid_single_emoji(emoji) is None]
+
+
+async def backfill_emoji(cache: Cache, complete_json: CompleteJson, batch_size: int = 25, concurrency: int = 4,
+                         limit: Optional[int] = None, progress: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
+    """Resolve emoji for every item that lacks a valid one.
+
+    Names are sent ``batch_size`` per prompt with at most ``concurrency``
+    prompts in flight. Results are applied to the cache in one go at the end;
+    persisting them is left to the caller. ``progress`` is updated in place
+    so callers can report on a running job. Returns the emoji it set, by
+    item name.
+    """
+    stats = progress if progress is not None else {}
+    missing = items_missing_emoji(cache)
+    if limit is not None:
+        missing = missing[:limit]
+    batch_size = max(1, batch_size)
+    chunks = [missing[start:start + batch_size] for start in range(0, len(missing), batch_size)]
+    stats.update(missing=len(missing), requests_total=len(chunks), requests_done=0, resolved=0, failed=0)
+    log.info('Backfilling emoji for %d items in %d requests', len(missing), len(chunks))
+
+    found: Dict[str, str] = {}
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def _resolve(names: List[str]):
+        async with semaphore:
+            response = await complete_json(EMOJI_BATCH_SYSTEM_PROMPT, emoji_batch_user_prompt(names), 'Emoji backfill')
+        entries = parse_batch_results(response, len(names), field='emoji')
+        for name, entry in zip(names, entries):
+            emoji = valid_single_emoji(entry.get('emoji')) if entry else None
+            if emoji:
+                found[name] = emoji
+                stats['resolved'] += 1
+            else:
+                stats['failed'] += 1
+        stats['requests_done'] += 1
+
+    await asyncio.gather(*(_resolve(names) for names in chunks))
+    cache.set_item_emojis(found)
+    log.info('Emoji backfill resolved %d of %d items', len(found), len(missing))
+    return found
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Fill in missing or invalid item emoji in the cache, several items per LLM request.",
+    )
+    parser.add_argument("--combo-cache", default="cache/combocache.json", help="Combo cache JSON")
+    parser.add_argument("--item-cache", default="cache/itemcache.json", help="Item cache JSON to backfill")
+    parser.add_argument(
+        "--db",
+        default=None,
+        help="Backfill the SQLite cache database at this path instead of the JSON files",
+    )
+    parser.add_argument("--batch-size", type=int, default=25, help="Items per LLM request")
+    parser.add_argument("--concurrency", type=int, default=4, help="Simultaneous LLM requests")
+    parser.add_argument("--limit", type=int, default=None, help="Only backfill this many items")
+    parser.add_argument("--dry-run", action="store_true", help="Only count the items lacking an emoji")
+    parser.add_argument("--verbose", action="store_true", help="Log every LLM request")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format='%(asctime)s %(levelname)s [%(name)s] %(message)s',
+    )
+
+    if args.db:
+        cache = SqliteCache(args.db, args.combo_cache, args.item_cache)
+    else:
+        cache = Cache(args.combo_cache, args.item_cache)
+    cache.load()
+
+    if args.dry_run:
+        print(f"{len(items_missing_emoji(cache))} items lack a valid emoji.")
+        cache.close()
+        return
+    if not os.getenv("LLM_KEY") and not os.getenv("LLM_ENDPOINTS"):
+        print("LLM_KEY or LLM_ENDPOINTS must be set", file=sys.stderr)
+        sys.exit(1)
+
+    stats: Dict[str, Any] = {}
+
+    async def _run():
+        llm = LLMClient.from_env()
+        try:
+            await backfill_emoji(
+                cache,
+                lambda system_prompt, user_prompt, label: llm.complete_json(system_prompt, user_prompt, label=label),
+                batch_size=args.batch_size,
+                concurrency=args.concurrency,
+                limit=args.limit,
+                progress=stats,
+            )
+        finally:
+            await llm.aclose()
+
+    asyncio.run(_run())
+    cache.save()
+    cache.close()
+    print(
+        f"Done. Resolved {stats['resolved']} of {stats['missing']} items in {stats['requests_total']} requests, "
+        f"{stats['failed']} still lack an emoji.",
+    )
+
+
+if __name__ == "__main__":
+    main()
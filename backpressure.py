@@ -0,0 +1,179 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+log = logging.getLogger('Backpressure')
+
+# Queued message types a newer message of the key type makes obsolete
+SUPERSEDES = {
+    'items': {'items', 'items_add', 'items_up_to_date'},
+    'bingo': {'bingo', 'bingo_cell'},
+    'users': {'users', 'users_join', 'users_leave'},
+    'timer': {'timer'},
+    'stopwatch': {'stopwatch'},
+    'mode': {'mode'},
+    'state': {'state', 'clear', 'mode', 'username', 'stopwatch', 'timer', 'items', 'items_add', 'items_up_to_date',
+              'bingo', 'hide_bingo'},
+}
+
+
+class SessionOutbox:
+    __slots__ = ('sid', 'pending', 'draining', 'over_since', 'held', 'collapsed', 'peak')
+
+    def __init__(self, sid: str):
+        self.sid = sid
+        self.pending: List[Dict[str, Any]] = []
+        # Held messages are being released; newer ones must queue behind them
+        self.draining = False
+        self.over_since: Optional[float] = None
+        self.held = 0
+        self.collapsed = 0
+        self.peak = 0
+
+
+class Backpressure:
+    """Outbound queue accounting per socket session.
+
+    The backlog of a session is the engine.io packet queue of its socket,
+    i.e. what was emitted but not yet written to the connection. Once it
+    reaches ``high``, further messages for that session are held here
+    instead, where a newer ``items``, ``bingo`` or other snapshot replaces
+    the queued ones it supersedes. Held messages are released once the
+    backlog drains to ``low``. A session whose backlog plus held messages
+    stays above ``high`` for ``grace`` seconds, or that has more than
+    ``max_held`` messages held, is disconnected.
+    """
+
+    def __init__(self, controller, high: int = 64, low: int = 16, max_held: int = 256, grace: float = 15.0,
+                 interval: float = 0.25):
+        self.controller = controller
+        self.high = max(1, high)
+        self.low = max(0, min(low, self.high - 1))
+        self.max_held = max(1, max_held)
+        self.grace = max(0.0, grace)
+        self.interval = interval
+        self._boxes: Dict[str, SessionOutbox] = {}
+        self._drain_task: Optional[asyncio.Task] = None
+        self.disconnected = 0
+
+    def backlog(self, sid: str) -> int:
+        """Packets queued in the engine.io socket of ``sid``; 0 if it is gone."""
+        server = self.controller.socket_server
+        try:
+            eio_sid = server.manager.eio_sid_from_sid(sid, self.controller.namespace)
+            return server.eio._get_socket(eio_sid).queue.qsize()
+        except (AttributeError, KeyError):
+            return 0
+
+    def is_congested(self, sid: str) -> bool:
+        box = self._boxes.get(sid)
+        if box is not None and (box.pending or box.draining):
+            return True
+        return self.backlog(sid) >= self.high
+
+    async def send(self, sid: str, message: Dict[str, Any]):
+        if self.is_congested(sid):
+            self.hold(sid, message)
+            return
+        await self._emit(sid, message)
+
+    def hold(self, sid: str, message: Dict[str, Any]):
+        """Queue a message for a congested session, dropping queued messages it supersedes."""
+        box = self._boxes.get(sid)
+        if box is None:
+            box = self._boxes[sid] = SessionOutbox(sid)
+        superseded = SUPERSEDES.get(message.get('type'))
+        if superseded and box.pending:
+            kept = []
+            carried: List[list] = []
+            for queued in box.pending:
+                if queued.get('type') in superseded:
+                    # Compact dictionary entries are sent once, so they move to the next surviving message
+                    carried.extend(queued.get('dict', ()))
+                    box.collapsed += 1
+                    continue
+                if carried:
+                    queued = {**queued, 'dict': carried + list(queued.get('dict', ()))}
+                    carried = []
+                kept.append(queued)
+            if carried:
+                message = {**message, 'dict': carried + list(message.get('dict', ()))}
+            box.pending = kept
+        box.pending.append(message)
+        box.held += 1
+        box.peak = max(box.peak, len(box.pending))
+        if len(box.pending) > self.max_held:
+            log.warning('Session %s has %d messages held, disconnecting', sid, len(box.pending))
+            self._disconnect(box)
+            return
+        if self._drain_task is None or self._drain_task.done():
+            self._drain_task = asyncio.ensure_future(self._drain())
+
+    def forget(self, sid: str):
+        self._boxes.pop(sid, None)
+
+    async def _emit(self, sid: str, message: Dict[str, Any]):
+        await self.controller.socket_server.emit('server_message', message, namespace=self.controller.namespace,
+                                                 to=sid)
+
+    def _disconnect(self, box: SessionOutbox):
+        self._boxes.pop(box.sid, None)
+        self.disconnected += 1
+        asyncio.ensure_future(self.controller.socket_server.disconnect(box.sid, namespace=self.controller.namespace))
+
+    async def _release(self, box: SessionOutbox, count: int):
+        release, box.pending = box.pending[:count], box.pending[count:]
+        box.draining = True
+        try:
+            for position, message in enumerate(release):
+                try:
+                    await self._emit(box.sid, message)
+                except Exception as exc:
+                    # Keep the rest in order; a dead socket is cleaned up by its disconnect
+                    log.error('Releasing held messages to %s failed: %s', box.sid, exc)
+                    box.pending = release[position:] + box.pending
+                    return
+        finally:
+            box.draining = False
+
+    async def _drain(self):
+        while any(box.pending or box.over_since is not None for box in self._boxes.values()):
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            for box in list(self._boxes.values()):
+                if not box.pending and box.over_since is None:
+                    continue
+                backlog = self.backlog(box.sid)
+                if box.pending and backlog <= self.low:
+                    await self._release(box, self.high - backlog)
+                    backlog = self.backlog(box.sid)
+                if backlog + len(box.pending) <= self.high:
+                    box.over_since = None
+                    continue
+                if box.over_since is None:
+                    box.over_since = now
+                elif now - box.over_since > self.grace:
+                    log.warning('Session %s stayed over the outbound limit for %.0fs, disconnecting',
+                                box.sid, now - box.over_since)
+                    self._disconnect(box)
+
+    def session_stats(self, sid: str) -> Dict[str, Any]:
+        box = self._boxes.get(sid)
+        return {
+            "backlog": self.backlog(sid),
+            "held": len(box.pending) if box else 0,
+            "held_total": box.held if box else 0,
+            "peak_held": box.peak if box else 0,
+            "collapsed": box.collapsed if box else 0,
+            "over_limit_for": round(time.monotonic() - box.over_since, 1) if box and box.over_since else 0.0,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "high_watermark": self.high,
+            "low_watermark": self.low,
+            "congested_sessions": sum(1 for box in self._boxes.values() if box.pending),
+            "held": sum(len(box.pending) for box in self._boxes.values()),
+            "disconnected": self.disconnected,
+        }
@@ -0,0 +1,82 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+log = logging.getLogger('ComboBatcher')
+
+Pair = Tuple[str, str]
+BatchSender = Callable[[List[Pair]], Awaitable[List[Optional[Dict[str, Any]]]]]
+
+
+class ComboBatcher:
+    """Collects combo lookups for a short window and resolves them with one request.
+
+    ``submit`` resolves to the raw result for its pair, or None when the batch
+    answer for that pair was missing or malformed; callers fall back to a
+    single request in that case. A window of 0 disables batching.
+    """
+
+    def __init__(self, send_batch: BatchSender, window: float = 0.0, max_size: int = 8):
+        self.send_batch = send_batch
+        self.window = max(0.0, window)
+        self.max_size = max(1, max_size)
+        self._pending: List[Tuple[Pair, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+        self.batches_sent = 0
+        self.pairs_batched = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0 and self.max_size > 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "window": self.window,
+            "max_size": self.max_size,
+            "pending": len(self._pending),
+            "batches_sent": self.batches_sent,
+            "pairs_batched": self.pairs_batched,
+        }
+
+    async def submit(self, item1: str, item2: str) -> Optional[Dict[str, Any]]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append(((item1, item2), future))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._send(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: List[Tuple[Pair, asyncio.Future]]):
+        pairs = [pair for pair, _ in batch]
+        if len(pairs) == 1:
+            # A lone pair is cheaper as a normal single request
+            results: List[Optional[Dict[str, Any]]] = [None]
+        else:
+            self.batches_sent += 1
+            self.pairs_batched += len(pairs)
+            log.info('Sending batch of %d combos', len(pairs))
+            try:
+                results = await self.send_batch(pairs)
+            except Exception:
+                log.exception('Batch combo request failed')
+                results = []
+
+        for index, (_, future) in enumerate(batch):
+            if future.done():
+                continue
+            future.set_result(results[index] if index < len(results) else None)
@@ -0,0 +1,93 @@
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple
+
+
+def normalize_cell_text(text: str) -> str:
+    return (text or '').strip().casefold()
+
+
+@lru_cache(maxsize=None)
+def line_masks(size: int) -> Tuple[int, ...]:
+    """Bitmasks of every row, column and both diagonals of a ``size`` x ``size`` board."""
+    lines = []
+    for i in range(size):
+        lines.append(sum(1 << (i * size + j) for j in range(size)))
+        lines.append(sum(1 << (j * size + i) for j in range(size)))
+    lines.append(sum(1 << (i * size + i) for i in range(size)))
+    lines.append(sum(1 << (i * size + (size - 1 - i)) for i in range(size)))
+    return tuple(lines)
+
+
+@lru_cache(maxsize=None)
+def cell_lines(size: int) -> Tuple[Tuple[int, ...], ...]:
+    """For each cell index, the indices into ``line_masks(size)`` of the lines through it."""
+    masks = line_masks(size)
+    return tuple(
+        tuple(line for line, mask in enumerate(masks) if mask >> index & 1)
+        for index in range(size * size)
+    )
+
+
+class BingoBoard:
+    """Claimed cells of a bingo board as one integer bitboard per player.
+
+    Each player also has a counter per line (row, column, diagonal) of the
+    cells they hold on it, free cells included, so claiming or unclaiming a
+    cell only touches the lines through that cell and the number of
+    completed lines is always current.
+    """
+
+    def __init__(self, size: int, free_indices: Iterable[int] = ()):
+        self.size = size
+        self.free_mask = sum(1 << index for index in free_indices)
+        self._lines = cell_lines(size)
+        self._free_counts = [bin(mask & self.free_mask).count('1') for mask in line_masks(size)]
+        self._boards: Dict[str, int] = {}
+        self._line_counts: Dict[str, List[int]] = {}
+        self._bingos: Dict[str, int] = {}
+
+    def owns(self, uuid: str, index: int) -> bool:
+        return bool(self._boards.get(uuid, 0) >> index & 1)
+
+    def claim(self, uuid: str, index: int) -> bool:
+        """Mark ``index`` as held by ``uuid``; False if it already was or is a free cell."""
+        board = self._boards.get(uuid, 0)
+        bit = 1 << index
+        if (board | self.free_mask) & bit:
+            return False
+        self._boards[uuid] = board | bit
+        counts = self._line_counts.get(uuid)
+        if counts is None:
+            counts = self._line_counts[uuid] = list(self._free_counts)
+            self._bingos[uuid] = sum(1 for count in counts if count == self.size)
+        for line in self._lines[index]:
+            counts[line] += 1
+            if counts[line] == self.size:
+                self._bingos[uuid] += 1
+        return True
+
+    def unclaim(self, uuid: str, index: int) -> bool:
+        """Release ``index`` for ``uuid``; False if they did not hold it."""
+        board = self._boards.get(uuid, 0)
+        bit = 1 << index
+        if not board & bit:
+            return False
+        self._boards[uuid] = board & ~bit
+        counts = self._line_counts[uuid]
+        for line in self._lines[index]:
+            if counts[line] == self.size:
+                self._bingos[uuid] -= 1
+            counts[line] -= 1
+        return True
+
+    def players(self) -> List[str]:
+        """Players holding at least one cell."""
+        return [uuid for uuid, board in self._boards.items() if board]
+
+    def cell_count(self, uuid: str) -> int:
+        """Cells held by ``uuid``, free cells included."""
+        return bin(self._boards.get(uuid, 0) | self.free_mask).count('1')
+
+    def bingo_count(self, uuid: str) -> int:
+        """Completed rows, columns and diagonals of ``uuid``."""
+        return self._bingos.get(uuid, 0)
@@ -1,7 +1,8 @@
 import json
-import os
 from typing import Optional
 
+from persistence import write_json_atomic
+
 
 class Cache:
     def __init__(self, combo_file: str = 'cache/combocache.json', item_file: str = 'cache/itemcache.json'):
@@ -9,6 +10,20 @@ class Cache:
         self.itemcache = {}
         self.combo_file = combo_file
         self.item_file = item_file
+        # casefolded name -> canonical spelling, split so item names win over combo results
+        self._item_names = {}
+        self._combo_names = {}
+        self.persistence = None
+
+    def attach_persistence(self, persistence):
+        """Hand dirty tracking to a PersistenceScheduler instead of explicit save() calls."""
+        self.persistence = persistence
+        persistence.register('combocache', self.combo_file, lambda: dict(self.combocache))
+        persistence.register('itemcache', self.item_file, lambda: dict(self.itemcache))
+
+    def _mark_dirty(self, name: str):
+        if self.persistence is not None:
+            self.persistence.mark_dirty(name)
 
     def _normalize_key(self, item1: str, item2: str) -> str:
         a = (item1 or '').strip().lower()
@@ -19,22 +34,41 @@ class Cache:
     def _is_none_value(self, value: Optional[str]) -> bool:
         return value is None or (isinstance(value, str) and value.strip().lower() == "none")
 
-    def find_existing_name(self, name: Optional[str]) -> Optional[str]:
+    def _normalize_name(self, name: Optional[str]) -> Optional[str]:
         if not isinstance(name, str):
             return None
-        target = name.strip().lower()
-        if not target:
-            return None
+        return name.strip().casefold() or None
 
-        for existing in self.itemcache.keys():
-            if isinstance(existing, str) and existing.strip().lower() == target:
-                return existing
+    def _index_item_name(self, name: Optional[str]):
+        normalized = self._normalize_name(name)
+        if normalized:
+            self._item_names.setdefault(normalized, name)
 
+    def _index_combo_name(self, name: Optional[str]):
+        normalized = self._normalize_name(name)
+        if normalized:
+            self._combo_names.setdefault(normalized, name)
+
+    def _rebuild_name_index(self):
+        self._item_names = {}
+        self._combo_names = {}
+        for existing in self.itemcache.keys():
+            self._index_item_name(existing)
         for existing in self.combocache.values():
-            if isinstance(existing, str) and existing.strip().lower() == target:
-                return existing
+            self._index_combo_name(existing)
 
-        return None
+    def find_existing_name(self, name: Optional[str]) -> Optional[str]:
+        target = self._normalize_name(name)
+        if not target:
+            return None
+        return self._item_names.get(target) or self._combo_names.get(target)
+
+    def item_names(self):
+        return list(self.itemcache.keys())
+
+    def item_emojis(self):
+        """(name, emoji) for every known item, emoji as returned by ``get_item_emoji``."""
+        return [(name, self.get_item_emoji(name)) for name in list(self.itemcache.keys())]
 
     def get_item_emoji(self, name: str):
         emoji = self.itemcache.get(name)
@@ -59,11 +93,14 @@ class Cache:
         key = self._normalize_key(item1, item2)
         if self._is_none_value(result_name):
             self.combocache[key] = None
+            self._mark_dirty('combocache')
             return
 
         resolved_name = self.find_existing_name(result_name) or result_name
         result_name = resolved_name
         self.combocache[key] = result_name
+        self._index_combo_name(result_name)
+        self._mark_dirty('combocache')
         if result_emoji is not None and result_name is not None:
             self.set_item_emoji(result_name, result_emoji)
 
@@ -73,6 +110,13 @@ class Cache:
         # Overwrite missing or null emoji entries, preserve existing valid ones
         if self.itemcache.get(name) != emoji:
             self.itemcache[name] = emoji
+            self._index_item_name(name)
+            self._mark_dirty('itemcache')
+
+    def set_item_emojis(self, emojis: dict):
+        """Apply many emoji updates at once (name -> emoji)."""
+        for name, emoji in emojis.items():
+            self.set_item_emoji(name, emoji)
 
     def _load_mapping(self, path: Optional[str]):
         if not path:
@@ -92,9 +136,7 @@ class Cache:
     def _write_mapping(self, path: Optional[str], mapping: dict):
         if not path:
             return
-        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump(mapping, f, ensure_ascii=True, indent=2)
+        write_json_atomic(path, mapping, ensure_ascii=True, indent=2)
 
     def load(self, combo_file: Optional[str] = None, item_file: Optional[str] = None):
         combo_path = combo_file or self.combo_file
@@ -108,9 +150,14 @@ class Cache:
         for key in list(self.itemcache.keys()):
             if self._is_none_value(key):
                 del self.itemcache[key]
+        self._rebuild_name_index()
 
     def save(self, combo_file: Optional[str] = None, item_file: Optional[str] = None):
         combo_path = combo_file or self.combo_file
         item_path = item_file or self.item_file
         self._write_mapping(combo_path, self.combocache)
         self._write_mapping(item_path, self.itemcache)
+
+    def close(self):
+        # JSON files are written through save() or the persistence scheduler; nothing is held open.
+        pass
@@ -0,0 +1,172 @@
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+import regex
+
+log = logging.getLogger('Combos')
+
+# Shown for a known item until its emoji has been resolved in the background
+PLACEHOLDER_EMOJI = os.getenv('PLACEHOLDER_EMOJI', '❔')
+
+COMBO_SYSTEM_PROMPT = (
+    "You are an expert game designer for a creative combination game. "
+    "Players combine elements like Air, Earth, Fire, and Water to create new elements. "
+    "Each combination results in a new or existing element, or 'None' if it's impossible."
+    "*** IMPORTANT ***"
+    "NEVER output more than 1 element at a time."
+    "Be creative but still logically correct!"
+    "Sometimes the user will combine two of the same element. In some cases the output should be a bigger version of the element or just the same element again."
+    "DO NOT escalate the elements to absurd levels, for example Extreme Fire, Ultra Water, Infinite Air or Eternal Earth."
+    "For example, combining Water and Water might give us Ocean."
+    "Don't just add bigger adjectives like 'Big', 'Double', 'Mega' or 'Infinite' to the element name. Instead, think of a logical larger version of the element."
+    "Outputting '[Element1], [Element2]' as an element is not appropriate. Please provide a creative and logically correct response."
+    "Air and Fire should not be equal to Lava."
+    "Air and Stone should be Sand. As the air would erode the stone."
+    "Sand and Stone should not be Beach but rather Sandstone."
+    "Not and Heat should be Cold."
+    "Beer and Country should be Germany."
+    "Sand and Mud should be Clay."
+    "*** VERY IMPORTANT ***"
+    "PLEASE avoid outputting esoteric or nonsensical responses such as Molten Gypsum Glass Concrete!"
+    "Please use spaces between words and you MUST NOT use CamelCase or snake_case."
+    "Don't just combine words of the two elements. Try to combine the elements in a way that makes sense."
+    "If the two elements cannot logically be combined or are too nonsensical, respond with None."
+    "Elements can be any Noun, including objects, concepts, or phenomena."
+    "Use a single relevant emoji to represent the resulting element."
+    "Don't use emoji in the element name. Only use emoji in the emoji field."
+    "When given two items, invent a new item that could logically result from combining them, but orient yourself on existing concepts."
+    "Respond concisely with a JSON object containing 'name' (the new item's name, less than 30 characters) and 'emoji' (a single relevant emoji, not text)."
+)
+
+BATCH_SYSTEM_SUFFIX = (
+    "*** BATCH MODE ***"
+    "You will receive several numbered pairs at once. Treat every pair independently, exactly as if it was the only one."
+    "Respond with a JSON object containing 'results': an array with one object per pair, in the same order, "
+    "each with 'index' (the pair number), 'name' and 'emoji' as described above."
+)
+
+
+def combo_user_prompt(item1: str, item2: str) -> str:
+    return (
+        f"Combine '{item1}' and '{item2}' into a new sensible item. "
+        "Return only a JSON object with 'name' (shorter than 30 characters or None) and 'emoji' (a single emoji)."
+    )
+
+
+def combo_batch_user_prompt(pairs) -> str:
+    lines = [f"{index}. '{item1}' and '{item2}'" for index, (item1, item2) in enumerate(pairs)]
+    return (
+        "Combine each of the following pairs into a new sensible item:\n"
+        + "\n".join(lines)
+        + "\nReturn only a JSON object with 'results', one entry per pair with 'index', "
+        "'name' (shorter than 30 characters or None) and 'emoji' (a single emoji)."
+    )
+
+
+EMOJI_SYSTEM_PROMPT = (
+    "You pick a single emoji that best represents a given item name. "
+    "Use common, recognizable emoji only. Respond only with a JSON object containing the key 'emoji'."
+)
+
+
+def emoji_user_prompt(item_name: str) -> str:
+    return (
+        f"Provide one emoji that represents '{item_name}'. "
+        "Return only a JSON object with key 'emoji' and no extra text."
+    )
+
+
+EMOJI_BATCH_SYSTEM_PROMPT = (
+    "You pick a single emoji that best represents each of several given item names. "
+    "Use common, recognizable emoji only. Treat every item independently. "
+    "Respond only with a JSON object containing 'results': an array with one object per item, in the same order, "
+    "each with 'index' (the item number) and 'emoji'."
+)
+
+
+def emoji_batch_user_prompt(names) -> str:
+    lines = [f"{index}. '{name}'" for index, name in enumerate(names)]
+    return (
+        "Provide one emoji for each of the following items:\n"
+        + "\n".join(lines)
+        + "\nReturn only a JSON object with 'results', one entry per item with 'index' and 'emoji', and no extra text."
+    )
+
+
+def _is_single_emoji(s: str) -> bool:
+    # Grapheme cluster check to keep single emoji outputs
+    return isinstance(s, str) and regex.fullmatch(r"\X", s) is not None and len(s) <= 3
+
+
+def _normalize_emoji_candidate(emoji: Optional[str]) -> Optional[str]:
+    if not isinstance(emoji, str):
+        return None
+    cleaned = emoji.strip()
+    return cleaned or None
+
+
+def valid_single_emoji(emoji: Optional[str]) -> Optional[str]:
+    cleaned = _normalize_emoji_candidate(emoji)
+    if cleaned and _is_single_emoji(cleaned):
+        return cleaned
+    return None
+
+
+def parse_batch_results(response: Optional[Dict[str, Any]], count: int,
+                        field: str = 'name') -> List[Optional[Dict[str, Any]]]:
+    """Split a batch answer into per-entry raw results. Missing or malformed entries come back as None."""
+    results: List[Optional[Dict[str, Any]]] = [None] * count
+    entries = response.get('results') if isinstance(response, dict) else None
+    if not isinstance(entries, list):
+        log.error(f"Batch LLM response has no 'results' list: {response}")
+        return results
+
+    for position, entry in enumerate(entries):
+        if not isinstance(entry, dict) or field not in entry:
+            log.error(f"Malformed batch entry: {entry!r}")
+            continue
+        index = entry.get('index', position)
+        if not isinstance(index, int) or not 0 <= index < count or results[index] is not None:
+            log.error(f"Batch entry with invalid index: {entry!r}")
+            continue
+        results[index] = entry
+    return results
+
+
+def store_combo_result(cache, item1: str, item2: str, result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Validate a raw LLM combo answer and write it to the cache.
+
+    Returns the item dict for the player, or None when there is no usable result.
+    """
+    name = result.get("name")
+    stripped_name = name.strip().lower() if isinstance(name, str) else None
+    if stripped_name == "none":
+        name = None
+
+    if isinstance(name, str):
+        existing_name = cache.find_existing_name(name)
+        if existing_name:
+            name = existing_name
+
+    emoji_from_llm = valid_single_emoji(result.get("emoji"))
+    cached_emoji = valid_single_emoji(cache.get_item_emoji(name)) if isinstance(name, str) else None
+    final_emoji = cached_emoji or emoji_from_llm
+
+    log.debug(f"LLM returned: name={name!r}, emoji={result.get('emoji')!r}, cached_emoji={cached_emoji!r}")
+
+    if name is None:
+        cache.add_combo(item1, item2, None, None)
+        return None
+
+    if isinstance(name, str) and 1 <= len(name) <= 40:
+        emoji_to_store = final_emoji
+        emoji_for_user = emoji_to_store if emoji_to_store is not None else ""
+        if emoji_from_llm is None and result.get("emoji"):
+            log.error(f"Malformed emoji for {name!r}, storing None: {result.get('emoji')!r}")
+
+        cache.add_combo(item1, item2, name, emoji_to_store)
+        return {"name": name, "emoji": emoji_for_user}
+
+    log.error(f"Malformed result from LLM: {result}")
+    return None
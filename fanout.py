@@ -0,0 +1,97 @@
+import asyncio
+import logging
+from typing import Any, Dict, List
+
+log = logging.getLogger('Fanout')
+
+PLAYERS_ROOM = 'players'
+
+
+class Fanout:
+    """Sends one message to many players with as few encodes and awaits as possible.
+
+    Joined players sit in a Socket.IO room, so a message everyone receives
+    is a single room emit. For per-player messages, recipients of the same
+    message object are grouped into one emit addressed to all their sids,
+    which python-socketio encodes once; the groups are emitted concurrently,
+    at most ``concurrency`` at a time, so one slow socket does not hold up
+    the rest. Compact sessions get their own encoding of item-bearing
+    messages and therefore their own emit, and congested sessions are
+    skipped and handed to the controller's ``Backpressure`` instead.
+    """
+
+    def __init__(self, controller, concurrency: int = 16):
+        self.controller = controller
+        self.concurrency = max(1, concurrency)
+        self.room_emits = 0
+        self.group_emits = 0
+        self.recipients = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "concurrency": self.concurrency,
+            "room_emits": self.room_emits,
+            "group_emits": self.group_emits,
+            "recipients": self.recipients,
+        }
+
+    async def _emit(self, message: Dict[str, Any], to):
+        await self.controller.socket_server.emit('server_message', message, namespace=self.controller.namespace, to=to)
+
+    async def broadcast(self, message: Dict[str, Any]):
+        """Send ``message`` to every joined player."""
+        controller = self.controller
+        # sid -> message for compact sessions that need their own encoding
+        own: Dict[str, Dict[str, Any]] = {}
+        for player in list(controller.players.values()):
+            encoded = message
+            if player.item_dict is not None:
+                encoded = controller.item_ids.encode(message, player.item_dict)
+            if encoded is not message or controller.backpressure.is_congested(player.sid):
+                own[player.sid] = encoded
+        log.debug('Broadcasting payload: %s', message)
+        self.room_emits += 1
+        self.recipients += len(controller.players) - len(own)
+        await controller.socket_server.emit('server_message', message, namespace=controller.namespace,
+                                            room=PLAYERS_ROOM, skip_sid=list(own))
+        if own:
+            await self._send_groups(own)
+
+    async def send_each(self, messages: Dict[str, Dict[str, Any]]):
+        """Send each player (by uuid) its own message; players sharing a message object share an emit."""
+        controller = self.controller
+        outgoing: Dict[str, Dict[str, Any]] = {}
+        for uuid, message in messages.items():
+            player = controller.players.get(uuid)
+            if player is None:
+                continue
+            if player.item_dict is not None:
+                message = controller.item_ids.encode(message, player.item_dict)
+            outgoing[player.sid] = message
+        await self._send_groups(outgoing)
+
+    async def _send_groups(self, outgoing: Dict[str, Dict[str, Any]]):
+        """Emit ``{sid: message}``, one emit per distinct message object."""
+        backpressure = self.controller.backpressure
+        groups: Dict[int, List[Any]] = {}
+        for sid, message in outgoing.items():
+            if backpressure.is_congested(sid):
+                backpressure.hold(sid, message)
+            else:
+                groups.setdefault(id(message), [message, []])[1].append(sid)
+        if not groups:
+            return
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def _send(message: Dict[str, Any], sids: List[str]):
+            async with semaphore:
+                await self._emit(message, sids[0] if len(sids) == 1 else sids)
+
+        self.group_emits += len(groups)
+        self.recipients += len(outgoing)
+        results = await asyncio.gather(*(_send(message, sids) for message, sids in groups.values()),
+                                       return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                log.error('Fan-out emit failed: %s', result)
+
@@ -1,27 +1,48 @@
 import atexit
 import asyncio
-import json
 import logging
 import os
+import time
 from dataclasses import dataclass
-from typing import Dict, Optional, Any, Tuple
-
-import httpx
-import regex
+from typing import Dict, List, Optional, Any, Tuple
 
+from backfill_emoji import backfill_emoji
+from backpressure import Backpressure
+from batching import ComboBatcher
 from cache import Cache
+from combos import (
+    BATCH_SYSTEM_SUFFIX,
+    COMBO_SYSTEM_PROMPT,
+    EMOJI_SYSTEM_PROMPT,
+    PLACEHOLDER_EMOJI,
+    combo_batch_user_prompt,
+    combo_user_prompt,
+    emoji_user_prompt,
+    parse_batch_results,
+    store_combo_result,
+    valid_single_emoji,
+)
+from fanout import Fanout, PLAYERS_ROOM
 from gamemodes.classic import ClassicGamemode
 from gamemodes.gamemode import AbstractGamemode
 from gamemodes.shared import SharedGamemode
 from gamemodes.bingo import BingoGamemode
 from gamemodes.shared_bingo import SharedBingoGamemode
-from templates import username, users, news, hide_bingo, clear
+from itemids import ItemRegistry
+from llm import LLMClient
+from pairs import PairPipeline
+from persistence import PersistenceScheduler
+from prefetch import Prefetcher
+from presence import PresenceBroadcaster
+from scheduler import LLMWorkQueue, PRIORITY_BACKGROUND
+from sqlite_cache import SqliteCache
+from templates import username, news, hide_bingo, clear, stopwatch
 import random
 
 log = logging.getLogger('GameController')
 COMBO_CACHE_FILE = 'cache/combocache.json'
 ITEM_CACHE_FILE = 'cache/itemcache.json'
-
+CACHE_DB_FILE = 'cache/cache.sqlite3'
 
 @dataclass
 class Player:
@@ -29,6 +50,10 @@ class Player:
     name: str
     sid: str
     color: Optional[str] = None
+    # (version, hash) of the item list the client restored from its own storage, until first used
+    known_items: Optional[Tuple[int, str]] = None
+    # Compact sessions: item id -> emoji this client was sent; None means the client wants names
+    item_dict: Optional[Dict[int, Optional[str]]] = None
 
 
 class GameController:
@@ -41,6 +66,10 @@ class GameController:
         self.sid_to_uuid: Dict[str, str] = {}
         self.available_colors = ["#EF4444", "#3B82F6", "#10B981", "#F59E0B", "#8B5CF6", "#EC4899", "#14B8A6", "#84CC16"]
         self.assigned_colors = {} # uuid -> color
+        self.persistence = PersistenceScheduler(
+            delay=float(os.getenv('PERSIST_DELAY', '2')),
+            max_delay=float(os.getenv('PERSIST_MAX_DELAY', '10')),
+        )
 
         env_gamemode = os.getenv('GAME_MODE', 'classic').lower()
         if env_gamemode == 'classic':
@@ -59,10 +88,57 @@ class GameController:
             log.info('Unknown GAME_MODE %s, falling back to Classic Gamemode', env_gamemode)
             self.gamemode = ClassicGamemode(self)
 
-        self.cache = Cache(COMBO_CACHE_FILE, ITEM_CACHE_FILE)
+        cache_backend = os.getenv('CACHE_BACKEND', 'json').lower()
+        if cache_backend == 'sqlite':
+            log.info('Using SQLite cache backend')
+            self.cache = SqliteCache(
+                os.getenv('CACHE_DB_FILE', CACHE_DB_FILE),
+                COMBO_CACHE_FILE,
+                ITEM_CACHE_FILE,
+                hot_size=int(os.getenv('CACHE_HOT_SIZE', '50000')),
+            )
+        else:
+            if cache_backend != 'json':
+                log.info('Unknown CACHE_BACKEND %s, falling back to JSON cache', cache_backend)
+            self.cache = Cache(COMBO_CACHE_FILE, ITEM_CACHE_FILE)
         log.info('Loading cache')
         self.cache.load()
-        atexit.register(self.save_cache)
+        self.cache.attach_persistence(self.persistence)
+        self.llm = LLMClient.from_env()
+        # Normalized combo key -> pending LLM lookup, shared by concurrent requesters
+        self._inflight_combos: Dict[str, asyncio.Future] = {}
+        # Normalized combo key -> monotonic expiry of a recent failed lookup
+        self._failed_combos: Dict[str, float] = {}
+        self._inflight_emoji: Dict[str, asyncio.Task] = {}
+        self.negative_ttl = float(os.getenv('LLM_NEGATIVE_TTL', '60'))
+        self.llm_queue = LLMWorkQueue(int(os.getenv('LLM_QUEUE_CONCURRENCY', '8')))
+        self.prefetcher = Prefetcher(
+            self,
+            per_hour=float(os.getenv('LLM_PREFETCH_PER_HOUR', '0')),
+            fanout=int(os.getenv('LLM_PREFETCH_FANOUT', '6')),
+        )
+        self.batcher = ComboBatcher(
+            self._ask_llm_batch,
+            window=float(os.getenv('LLM_BATCH_WINDOW_MS', '0')) / 1000,
+            max_size=int(os.getenv('LLM_BATCH_MAX_SIZE', '8')),
+        )
+        self.item_ids = ItemRegistry()
+        self.fanout = Fanout(self, concurrency=int(os.getenv('FANOUT_CONCURRENCY', '16')))
+        self.presence = PresenceBroadcaster(self, window=float(os.getenv('PRESENCE_WINDOW_MS', '250')) / 1000)
+        self.backpressure = Backpressure(
+            self,
+            high=int(os.getenv('OUTBOX_HIGH_WATERMARK', '64')),
+            low=int(os.getenv('OUTBOX_LOW_WATERMARK', '16')),
+            max_held=int(os.getenv('OUTBOX_MAX_HELD', '256')),
+            grace=float(os.getenv('SLOW_CONSUMER_GRACE_SECONDS', '15')),
+        )
+        self.pairs = PairPipeline(self, deadline=float(os.getenv('PAIR_DEADLINE_SECONDS', '30')),
+                                  retention=float(os.getenv('PAIR_UNDELIVERED_RETENTION_SECONDS', '600')))
+        self._emoji_backfill: Optional[asyncio.Task] = None
+        self.emoji_backfill_stats: Dict[str, Any] = {"running": False}
+        self.persistence.start()
+        atexit.register(self.persistence.stop)
+        atexit.register(self.cache.close)
         atexit.register(self.disconnect_all)
 
         # Stopwatch state (admin feature; optional for clients)
@@ -82,9 +158,13 @@ class GameController:
         except RuntimeError:
             asyncio.run(_disconnect())
 
-    def save_cache(self):
+    def save_cache(self) -> bool:
+        """Write the cache and item pools to disk now. Blocking; run it off the event loop."""
         log.info('Saving cache')
-        self.cache.save()
+        return self.persistence.flush(all_targets=True)
+
+    async def close(self):
+        await self.llm.aclose()
 
     async def _reset_clients_for_gamemode_change(self):
         log.info('Resetting clients before gamemode change')
@@ -99,20 +179,35 @@ class GameController:
             await self.gamemode.finish()
 
     async def send_to_all(self, data):
-        """Broadcast a message to every connected player."""
-        log.debug('Broadcasting payload: %s', data)
-        await self.socket_server.emit('server_message', data, namespace=self.namespace)
+        """Broadcast a message to every joined player."""
+        await self.fanout.broadcast(data)
+
+    async def send_each(self, messages: Dict[str, Any]):
+        """Send several players their own message (uuid -> message) concurrently."""
+        await self.fanout.send_each(messages)
 
     async def send_to_uuid(self, uuid: str, data):
         player = self.players.get(uuid)
         if not player:
             log.warning('Attempted to send to unknown player %s', uuid)
             return
+        if player.item_dict is not None:
+            data = self.item_ids.encode(data, player.item_dict)
         log.debug('Sending to %s: %s', uuid, data)
-        await self.socket_server.emit('server_message', data, namespace=self.namespace, to=player.sid)
+        await self.backpressure.send(player.sid, data)
     
+    def is_cheap_pair(self, item1: str, item2: str) -> bool:
+        """True if a pair is answered from the cache or joins a request already in flight."""
+        if self.cache.get_combo(item1, item2) is not None:
+            return True
+        return self.cache._normalize_key(item1, item2) in self._inflight_combos
+
     async def handle_client_pair(self, uuid: str, pair_id: int, item1: str, item2: str):
-        await self.gamemode.pair(uuid, pair_id, item1, item2)
+        # Returns after the pending ack; the answer follows from the pipeline
+        await self.pairs.submit(uuid, pair_id, item1, item2)
+
+    async def handle_client_items_resync(self, uuid: str):
+        await self.gamemode.sync_item_list(uuid, full=True)
 
     async def handle_client_username(self, uuid: str, new_username: str):
         # Usernames are managed by SSO; ignore client requests
@@ -135,8 +230,7 @@ class GameController:
         }
 
     async def send_stopwatch_state(self, uuid: Optional[str] = None):
-        state = self.get_stopwatch_state()
-        payload = {"type": "stopwatch", "data": state}
+        payload = stopwatch(self.get_stopwatch_state())
         if uuid:
             await self.send_to_uuid(uuid, payload)
         else:
@@ -161,7 +255,15 @@ class GameController:
         self.stopwatch_started_at = None
         await self.send_stopwatch_state()
 
-    async def handle_client_join(self, sid: str, uuid: str, name: str):
+    def take_known_items(self, uuid: str) -> Optional[Tuple[int, str]]:
+        player = self.players.get(uuid)
+        if player is None:
+            return None
+        known, player.known_items = player.known_items, None
+        return known
+
+    async def handle_client_join(self, sid: str, uuid: str, name: str, known_items: Optional[Tuple[int, str]] = None,
+                                 compact: bool = False):
         existing_player = self.players.get(uuid)
         if existing_player:
             log.info('Client with uuid %s reconnected, dropping old connection', uuid)
@@ -177,13 +279,17 @@ class GameController:
                  color = "#{:06x}".format(random.randint(0, 0xFFFFFF))
             self.assigned_colors[uuid] = color
 
-        player = Player(uuid=uuid, name=name, sid=sid, color=color)
+        player = Player(uuid=uuid, name=name, sid=sid, color=color, known_items=known_items,
+                        item_dict={} if compact else None)
         self.players[uuid] = player
         self.sid_to_uuid[sid] = uuid
+        await self.socket_server.enter_room(sid, PLAYERS_ROOM, namespace=self.namespace)
         await self.gamemode.join(uuid)
-        await self.broadcast_user_list()
+        await self.presence.joined(uuid)
+        await self.pairs.redeliver(uuid)
 
     async def handle_disconnect(self, sid: str):
+        self.backpressure.forget(sid)
         uuid = self.sid_to_uuid.pop(sid, None)
         if not uuid:
             return
@@ -191,25 +297,28 @@ class GameController:
             # We keep the color assigned in self.assigned_colors so if they reconnect they get same color
             del self.players[uuid]
             log.info('Client %s disconnected', uuid)
-            await self.broadcast_user_list()
+            self.presence.changed()
+            self.prefetcher.forget(uuid)
+            self.llm_queue.forget(uuid)
+            self.pairs.prune()
 
-    async def broadcast_user_list(self):
-        user_list = [
-            {"name": p.name, "color": p.color, "uuid": p.uuid} 
+    def user_list(self) -> List[Dict[str, Any]]:
+        return [
+            {"name": p.name, "color": p.color, "uuid": p.uuid}
             for p in self.players.values()
         ]
-        await self.send_to_all(users(user_list))
 
     async def set_gamemode(self, _gamemode: AbstractGamemode):
         await self._reset_clients_for_gamemode_change()
         if self.gamemode:
             await self.gamemode.stop()
+        self.pairs.reset()
         self.gamemode = _gamemode
         await self.gamemode.start()
 
     def list_users(self):
         return [
-            {"uuid": player.uuid, "name": player.name}
+            {"uuid": player.uuid, "name": player.name, "outbound": self.backpressure.session_stats(player.sid)}
             for player in self.players.values()
         ]
 
@@ -219,11 +328,13 @@ class GameController:
     async def switch_gamemode(self, mode_name: str, config: Optional[Dict[str, Any]] = None) -> str:
         normalized = (mode_name or '').strip().lower()
         config = config or {}
+        # New gamemodes load their pools from disk, so pending writes must land first
+        await asyncio.to_thread(self.persistence.flush)
 
         if normalized == 'classic':
-            new_mode = ClassicGamemode(self)
+            new_mode = ClassicGamemode(self, config)
         elif normalized == 'shared':
-            new_mode = SharedGamemode(self)
+            new_mode = SharedGamemode(self, config)
         elif normalized in ('shared_bingo', 'shared-bingo', 'sharedbingo'):
             new_mode = SharedBingoGamemode(self, config)
         elif normalized == 'bingo':
@@ -234,12 +345,56 @@ class GameController:
         await self.set_gamemode(new_mode)
         return new_mode.mode_name
 
+    def get_llm_stats(self) -> Dict[str, Any]:
+        return {
+            "client": self.llm.stats(),
+            "queue": self.llm_queue.stats(),
+            "prefetch": self.prefetcher.stats(),
+            "batcher": self.batcher.stats(),
+            "pairs": self.pairs.stats(),
+            "fanout": self.fanout.stats(),
+            "backpressure": self.backpressure.stats(),
+            "presence": self.presence.stats(),
+            "in_flight_combos": len(self._inflight_combos),
+            "recently_failed_combos": len(self._failed_combos),
+        }
+
+    def start_emoji_backfill(self, batch_size: int = 25, concurrency: int = 4, limit: Optional[int] = None) -> bool:
+        """Start the bulk emoji backfill in the background. False if one is already running."""
+        if self._emoji_backfill is not None and not self._emoji_backfill.done():
+            return False
+        self.emoji_backfill_stats = {"running": True, "started_at": time.time()}
+        self._emoji_backfill = asyncio.ensure_future(self._run_emoji_backfill(batch_size, concurrency, limit))
+        return True
+
+    async def _run_emoji_backfill(self, batch_size: int, concurrency: int, limit: Optional[int]):
+        stats = self.emoji_backfill_stats
+
+        async def _complete_json(system_prompt, user_prompt, label):
+            # Background priority so live combo requests always go first
+            return await self.llm_queue.run('emoji-backfill', PRIORITY_BACKGROUND,
+                                            lambda: self.llm.complete_json(system_prompt, user_prompt, label=label))
+
+        try:
+            found = await backfill_emoji(self.cache, _complete_json, batch_size=batch_size, concurrency=concurrency,
+                                         limit=limit, progress=stats)
+            stats["saved"] = await asyncio.to_thread(self.save_cache)
+            # Pools (and the players holding them) still show the old emoji
+            await self.gamemode.update_item_emojis(found)
+        except Exception as e:
+            log.exception('Emoji backfill failed')
+            stats["error"] = str(e)
+        finally:
+            stats["running"] = False
+            stats["finished_at"] = time.time()
+
     def get_player_name(self, uuid: str) -> Optional[str]:
         player = self.players.get(uuid)
         return player.name if player else None
     
     async def request_combo(self, uuid, pair_id, item1, item2):
         log.info('Requesting combo for %s and %s', item1, item2)
+        self.prefetcher.record_use(uuid, item1, item2)
         cached: Optional[Dict[str, Any]] = self.cache.get_combo(item1, item2)
         if cached:
             name = cached.get('name')
@@ -247,271 +402,126 @@ class GameController:
                 await self.gamemode.handle_combo(uuid, pair_id, item1, item2, None, True)
                 return
 
-            cached_emoji = self._valid_single_emoji(cached.get('emoji'))
-            cached['emoji'] = cached_emoji if cached_emoji is not None else None
-
-            if cached_emoji is None and isinstance(name, str):
-                emoji_value, persist = await self.ask_llm_for_emoji(name)
-                if emoji_value is not None:
-                    cached['emoji'] = emoji_value
-                if persist and emoji_value:
-                    self.cache.set_item_emoji(name, emoji_value)
-                    self.save_cache()
+            cached_emoji = valid_single_emoji(cached.get('emoji'))
+            cached['emoji'] = cached_emoji if cached_emoji is not None else PLACEHOLDER_EMOJI
             await self.gamemode.handle_combo(uuid, pair_id, item1, item2, cached, True)
+            if cached_emoji is None and isinstance(name, str):
+                # The player already has the item; the real emoji follows as an item_update
+                self._resolve_emoji_later(uuid, name)
         else:
             await self.ask_llm(uuid, pair_id, item1, item2)
     
     
-    def _is_single_emoji(self, s: str) -> bool:
-        # Grapheme cluster check to keep single emoji outputs
-        return isinstance(s, str) and regex.fullmatch(r"\X", s) is not None and len(s) <= 3
-
-    def _normalize_emoji_candidate(self, emoji: Optional[str]) -> Optional[str]:
-        if not isinstance(emoji, str):
-            return None
-        cleaned = emoji.strip()
-        return cleaned or None
+    def _resolve_emoji_later(self, uuid: str, name: str):
+        if name in self._inflight_emoji or self._recently_failed(f'emoji:{name}'):
+            return
+        task = asyncio.ensure_future(self._resolve_emoji(uuid, name))
+        self._inflight_emoji[name] = task
+        task.add_done_callback(lambda _: self._inflight_emoji.pop(name, None))
 
-    def _valid_single_emoji(self, emoji: Optional[str]) -> Optional[str]:
-        cleaned = self._normalize_emoji_candidate(emoji)
-        if cleaned and self._is_single_emoji(cleaned):
-            return cleaned
-        return None
+    async def _resolve_emoji(self, uuid: str, name: str):
+        try:
+            emoji, persist = await self.llm_queue.run(
+                uuid, self.gamemode.llm_priority(uuid), lambda: self.ask_llm_for_emoji(name))
+            if not (persist and emoji):
+                self._remember_failed_combo(f'emoji:{name}')
+                return
+            self.cache.set_item_emoji(name, emoji)
+            await self.gamemode.update_item_emoji(name, emoji)
+        except Exception:
+            log.exception('Resolving emoji for %s failed', name)
 
     async def ask_llm_for_emoji(self, item_name: str) -> Tuple[Optional[str], bool]:
         log.info('Requesting emoji for %s', item_name)
-        llm_url = os.getenv("LLM_API_URL") or "https://openrouter.ai/api/v1/chat/completions"
-        llm_model = os.getenv("LLM_MODEL") or "openrouter/auto"
-        llm_key = os.getenv("LLM_KEY")
-
-        if not llm_key:
-            log.error("LLM_KEY environment variable not set")
-            return None, False
-        if not llm_url:
-            log.error("LLM_API_URL environment variable not set")
+        result = await self.llm.complete_json(EMOJI_SYSTEM_PROMPT, emoji_user_prompt(item_name), label='Emoji LLM')
+        if result is None:
             return None, False
 
-        system_prompt = (
-            "You pick a single emoji that best represents a given item name. "
-            "Use common, recognizable emoji only. Respond only with a JSON object containing the key 'emoji'."
-        )
-        user_prompt = (
-            f"Provide one emoji that represents '{item_name}'. "
-            "Return only a JSON object with key 'emoji' and no extra text."
-        )
-        payload = {
-            "model": llm_model,
-            "messages": [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-            "response_format": {"type": "json_object"},
-            "stream": False,
-        }
+        emoji = valid_single_emoji(result.get("emoji"))
+        if emoji:
+            log.debug(f"Emoji LLM returned {emoji!r} for {item_name!r}")
+            return emoji, True
 
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    llm_url,
-                    json=payload,
-                    timeout=30.0,
-                    headers={"Authorization": f"Bearer {llm_key}"},
-                )
-
-            if response.status_code != 200:
-                log.error(f"Emoji LLM request failed: {response.status_code} {response.text}")
-                return None, False
-
-            try:
-                responseobj = response.json()
-            except Exception as e:
-                log.error(f"Emoji response is not valid JSON: {e}, body: {response.text[:200]!r}")
-                return None, False
-
-            if not isinstance(responseobj, dict):
-                log.error(f"Unexpected emoji JSON structure: {responseobj}")
-                return None, False
-
-            choices = responseobj.get("choices")
-            if not isinstance(choices, list) or not choices:
-                log.error(f"Missing or invalid 'choices' field for emoji request: {responseobj}")
-                return None, False
-
-            message = choices[0].get("message") if isinstance(choices[0], dict) else None
-            llm_response = message.get("content") if isinstance(message, dict) else None
-            if not isinstance(llm_response, str):
-                log.error(f"Missing or invalid emoji message content: {responseobj}")
-                return None, False
-
-            llm_response = llm_response.strip()
-            if llm_response.startswith("```") and llm_response.endswith("```"):
-                llm_response = llm_response[llm_response.find('\n')+1:llm_response.rfind("```")].strip()
-
-            try:
-                result = json.loads(llm_response)
-            except Exception as e:
-                log.error(f"Emoji message content is not valid JSON: {e}, body: {llm_response!r}")
-                return None, False
-
-            if not isinstance(result, dict):
-                log.error(f"Emoji message content is not a JSON object: {result}")
-                return None, False
-
-            emoji = self._valid_single_emoji(result.get("emoji"))
-            if emoji:
-                log.debug(f"Emoji LLM returned {emoji!r} for {item_name!r}")
-                return emoji, True
-
-            log.error(f"Emoji result malformed for {item_name!r}: {result}")
-            return "", False
-        except httpx.RequestError as e:
-            log.error(f"Network error requesting emoji LLM: {e}")
-        return None, False
+        log.error(f"Emoji result malformed for {item_name!r}: {result}")
+        return "", False
 
     async def ask_llm(self, uuid, pair_id, item1, item2):
-        log.info('Asking LLM for combo of %s and %s', item1, item2)
-        llm_url = os.getenv("LLM_API_URL") or "https://openrouter.ai/api/v1/chat/completions"
-        llm_model = os.getenv("LLM_MODEL") or "openrouter/auto"
-        llm_key = os.getenv("LLM_KEY")
-
-        if not llm_key:
-            log.error("LLM_KEY environment variable not set")
-            return await self.gamemode.handle_combo(uuid, pair_id, item1, item2, None, False)
-        if not llm_url:
-            log.error("LLM_API_URL environment variable not set")
+        key = self.cache._normalize_key(item1, item2)
+        if self._recently_failed(key):
+            log.info('Skipping LLM for %s and %s, it failed recently', item1, item2)
             return await self.gamemode.handle_combo(uuid, pair_id, item1, item2, None, False)
 
-        system_prompt = (
-            "You are an expert game designer for a creative combination game. "
-            "Players combine elements like Air, Earth, Fire, and Water to create new elements. "
-            "Each combination results in a new or existing element, or 'None' if it's impossible."
-            "*** IMPORTANT ***"
-            "NEVER output more than 1 element at a time."
-            "Be creative but still logically correct!"
-            "Sometimes the user will combine two of the same element. In some cases the output should be a bigger version of the element or just the same element again."
-            "DO NOT escalate the elements to absurd levels, for example Extreme Fire, Ultra Water, Infinite Air or Eternal Earth."
-            "For example, combining Water and Water might give us Ocean."
-            "Don't just add bigger adjectives like 'Big', 'Double', 'Mega' or 'Infinite' to the element name. Instead, think of a logical larger version of the element."
-            "Outputting '[Element1], [Element2]' as an element is not appropriate. Please provide a creative and logically correct response."
-            "Air and Fire should not be equal to Lava."
-            "Air and Stone should be Sand. As the air would erode the stone."
-            "Sand and Stone should not be Beach but rather Sandstone."
-            "Not and Heat should be Cold."
-            "Beer and Country should be Germany."
-            "Sand and Mud should be Clay."
-            "*** VERY IMPORTANT ***"
-            "PLEASE avoid outputting esoteric or nonsensical responses such as Molten Gypsum Glass Concrete!"
-            "Please use spaces between words and you MUST NOT use CamelCase or snake_case."
-            "Don't just combine words of the two elements. Try to combine the elements in a way that makes sense."
-            "If the two elements cannot logically be combined or are too nonsensical, respond with None."
-            "Elements can be any Noun, including objects, concepts, or phenomena."
-            "Use a single relevant emoji to represent the resulting element."
-            "Don't use emoji in the element name. Only use emoji in the emoji field."
-            "When given two items, invent a new item that could logically result from combining them, but orient yourself on existing concepts."
-            "Respond concisely with a JSON object containing 'name' (the new item's name, less than 30 characters) and 'emoji' (a single relevant emoji, not text)."
-        )
-        user_prompt = (
-            f"Combine '{item1}' and '{item2}' into a new sensible item. "
-            "Return only a JSON object with 'name' (shorter than 30 characters or None) and 'emoji' (a single emoji)."
-        )
-        payload = {
-            "model": llm_model,
-            "messages": [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-            "response_format": {"type": "json_object"},
-            "stream": False,
-        }
-
-        log.debug(f"Payload {payload}")
-
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    llm_url,
-                    json=payload,
-                    timeout=30.0,
-                    headers={"Authorization": f"Bearer {llm_key}"},
-                )
-
-            # --- Check HTTP response ---
-            if response.status_code != 200:
-                log.error(f"LLM request failed: {response.status_code} {response.text}")
-                return await self.gamemode.handle_combo(uuid, pair_id, item1, item2, None, False)
-
-            # --- Try parsing JSON ---
-            try:
-                responseobj = response.json()
-            except Exception as e:
-                log.error(f"Response is not valid JSON: {e}, body: {response.text[:200]!r}")
-                return await self.gamemode.handle_combo(uuid, pair_id, item1, item2, None, False)
-
-            # --- Validate result ---
-            if not isinstance(responseobj, dict):
-                log.error(f"Unexpected JSON structure: {responseobj}")
-                return await self.gamemode.handle_combo(uuid, pair_id, item1, item2, None, False)
-
-            choices = responseobj.get("choices")
-            if not isinstance(choices, list) or not choices:
-                log.error(f"Missing or invalid 'choices' field: {responseobj}")
-                return await self.gamemode.handle_combo(uuid, pair_id, item1, item2, None, False)
-
-            message = choices[0].get("message") if isinstance(choices[0], dict) else None
-            llm_response = message.get("content") if isinstance(message, dict) else None
-            if not isinstance(llm_response, str):
-                log.error(f"Missing or invalid message content: {responseobj}")
-                return await self.gamemode.handle_combo(uuid, pair_id, item1, item2, None, False)
-
-            # Response may be wrapped in fenced code blocks
-            llm_response = llm_response.strip()
-            if llm_response.startswith("```") and llm_response.endswith("```"):
-                llm_response = llm_response[llm_response.find('\n')+1:llm_response.rfind('```')].strip()
-            try:
-                result = json.loads(llm_response)
-            except Exception as e:
-                log.error(f"LLM message content is not valid JSON: {e}, body: {llm_response!r}")
-                return await self.gamemode.handle_combo(uuid, pair_id, item1, item2, None, False)
-
-            if not isinstance(result, dict):
-                log.error(f"LLM message content is not a JSON object: {result}")
-                return await self.gamemode.handle_combo(uuid, pair_id, item1, item2, None, False)
-
-            name = result.get("name")
-            stripped_name = name.strip().lower() if isinstance(name, str) else None
-            if stripped_name == "none":
-                name = None
-
-            if isinstance(name, str):
-                existing_name = self.cache.find_existing_name(name)
-                if existing_name:
-                    name = existing_name
-
-            emoji_from_llm = self._valid_single_emoji(result.get("emoji"))
-            cached_emoji = self._valid_single_emoji(self.cache.get_item_emoji(name)) if isinstance(name, str) else None
-            final_emoji = cached_emoji or emoji_from_llm
-
-            log.debug(f"LLM returned: name={name!r}, emoji={result.get('emoji')!r}, cached_emoji={cached_emoji!r}")
+        future = self._combo_future(uuid, item1, item2, self.gamemode.llm_priority(uuid))
+        # Shielded so one requester going away does not cancel the lookup for the others
+        result = await asyncio.shield(future)
+        result = dict(result) if result else None
+        return await self.gamemode.handle_combo(uuid, pair_id, item1, item2, result, False)
+
+    async def prefetch_combo(self, uuid, item1, item2):
+        """Resolve a combo into the cache without notifying anyone."""
+        await asyncio.shield(self._combo_future(uuid, item1, item2, PRIORITY_BACKGROUND, speculative=True))
+
+    def _combo_future(self, uuid, item1, item2, priority, speculative: bool = False) -> asyncio.Future:
+        key = self.cache._normalize_key(item1, item2)
+        future = self._inflight_combos.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self.llm_queue.run(
+                uuid, priority, lambda: self._fetch_combo(item1, item2, speculative)))
+            self._inflight_combos[key] = future
+            future.add_done_callback(lambda done: self._forget_inflight_combo(key, done))
+        else:
+            log.info('Joining in-flight LLM request for %s and %s', item1, item2)
+        return future
+
+    def _forget_inflight_combo(self, key: str, future: asyncio.Future):
+        if self._inflight_combos.get(key) is future:
+            del self._inflight_combos[key]
+
+    def _recently_failed(self, key: str) -> bool:
+        expires_at = self._failed_combos.get(key)
+        if expires_at is None:
+            return False
+        if expires_at <= time.monotonic():
+            del self._failed_combos[key]
+            return False
+        return True
+
+    def _remember_failed_combo(self, key: str):
+        """Negative-cache a failed lookup for a short TTL; unlike a stored None it is not permanent."""
+        if self.negative_ttl <= 0:
+            return
+        now = time.monotonic()
+        if len(self._failed_combos) >= 10000:
+            self._failed_combos = {k: t for k, t in self._failed_combos.items() if t > now}
+        self._failed_combos[key] = now + self.negative_ttl
 
-            if name is None:
-                self.cache.add_combo(item1, item2, None, None)
-                self.save_cache()
-                return await self.gamemode.handle_combo(uuid, pair_id, item1, item2, None, False)
-
-            if isinstance(name, str) and 1 <= len(name) <= 40:
-                emoji_to_store = final_emoji
-                emoji_for_user = emoji_to_store if emoji_to_store is not None else ""
-                if emoji_from_llm is None and result.get("emoji"):
-                    log.error(f"Malformed emoji for {name!r}, storing None: {result.get('emoji')!r}")
-
-                self.cache.add_combo(item1, item2, name, emoji_to_store)
-                self.save_cache()
-                normalized_result = {"name": name, "emoji": emoji_for_user}
-                return await self.gamemode.handle_combo(uuid, pair_id, item1, item2, normalized_result, False)
-
-            log.error(f"Malformed result from LLM: {result}")
-            return await self.gamemode.handle_combo(uuid, pair_id, item1, item2, None, False)
+    async def _fetch_combo(self, item1, item2, speculative: bool = False) -> Optional[Dict[str, Any]]:
+        """Ask the LLM for a combination and store it. Returns the item dict, or None for no result.
 
-        except httpx.RequestError as e:
-            log.error(f"Network error requesting LLM: {e}")
-        return await self.gamemode.handle_combo(uuid, pair_id, item1, item2, None, False)
\ No newline at end of file
+        A failed ``speculative`` (prefetch) lookup is not negative-cached, so a
+        player asking for the pair later still gets a real attempt.
+        """
+        log.info('Asking LLM for combo of %s and %s', item1, item2)
+        if self.batcher.enabled:
+            result = await self.batcher.submit(item1, item2)
+            if result is not None:
+                stored = store_combo_result(self.cache, item1, item2, result)
+                if stored is not None or self.cache.get_combo(item1, item2) is not None:
+                    return stored
+                # The batch answered this pair with something unusable; it gets its own request
+                log.info('Batched answer for %s and %s was rejected, asking on its own', item1, item2)
+        result = await self.llm.complete_json(COMBO_SYSTEM_PROMPT, combo_user_prompt(item1, item2))
+        stored = store_combo_result(self.cache, item1, item2, result) if result is not None else None
+        if stored is None and not speculative and self.cache.get_combo(item1, item2) is None:
+            # Nothing permanent was learned (upstream error or malformed answer)
+            self._remember_failed_combo(self.cache._normalize_key(item1, item2))
+        return stored
+
+    async def _ask_llm_batch(self, pairs) -> List[Optional[Dict[str, Any]]]:
+        """Resolve several pairs with one request. Missing or malformed entries come back as None."""
+        response = await self.llm.complete_json(
+            COMBO_SYSTEM_PROMPT + BATCH_SYSTEM_SUFFIX,
+            combo_batch_user_prompt(pairs),
+            label='Batch LLM',
+        )
+        return parse_batch_results(response, len(pairs))
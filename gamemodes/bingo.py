@@ -1,8 +1,10 @@
 import asyncio
 import logging
 import random
+from bingoboard import BingoBoard, normalize_cell_text
 from gamemodes.gamemode import AbstractGamemode
-from templates import bingo, news, timer, item
+from scheduler import PRIORITY_NORMAL, PRIORITY_URGENT
+from templates import bingo, bingo_cell, news, timer, item
 
 log = logging.getLogger('BingoGamemode')
 
@@ -24,7 +26,7 @@ class BingoGamemode(AbstractGamemode):
         parts.append("Bingo")
         parts.append("(Manual)" if self.manual_mode else "(Auto)")
         
-        super().__init__(game_controller, " ".join(parts))
+        super().__init__(game_controller, " ".join(parts), config)
 
         self.item_pools = {}
         
@@ -38,6 +40,12 @@ class BingoGamemode(AbstractGamemode):
         # Shared board state. 
         # format: list of dicts: {'text': "Word", 'owners': set([uuid1, uuid2, ...])}
         self.shared_cells = [] 
+        # Same ownership as bitboards, for win detection
+        self.board = BingoBoard(self.bingo_size)
+        # Normalized cell text -> cell indices, for auto mode
+        self._cells_by_text = {}
+        # Board snapshot shared by every player until a cell changes
+        self._board_message = None
         self.winners = set()
         self.bingo_counts = {} # uuid -> int
         self._last_winner_news = None
@@ -59,18 +67,24 @@ class BingoGamemode(AbstractGamemode):
         if new_item not in pool:
             pool.append(new_item)
 
-    async def _send_state(self, uuid):
-        await self.send(timer(self.timer_seconds), uuid)
-        await super()._send_state(uuid)
-        if self._last_winner_news:
-            await self.send(news(self._last_winner_news), uuid)
+    def _shared_state_parts(self):
+        shared = super()._shared_state_parts()
+        shared['timer'] = timer(self.timer_seconds)
+        shared['winner_news'] = news(self._last_winner_news) if self._last_winner_news else None
+        return shared
+
+    def _state_parts(self, uuid, shared):
+        parts = [shared['timer'], *super()._state_parts(uuid, shared)]
+        if shared['winner_news'] is not None:
+            parts.append(shared['winner_news'])
+        return parts
 
     async def start(self):
         self.item_pools = {}
         await super().start()
+        # The state snapshot already carried the board
         self._ensure_initialized()
         self._ensure_started()
-        await self.broadcast_bingo_field()
 
     def _ensure_initialized(self):
         if self._initialized: return
@@ -78,11 +92,12 @@ class BingoGamemode(AbstractGamemode):
         if self.custom_words:
             all_items = self.custom_words
         else:
-            all_items = list(self.game_controller.cache.itemcache.keys())
+            all_items = self.game_controller.cache.item_names()
 
         if not all_items:
              log.warning("Cache empty, deferring initialization")
              self.shared_cells = [{"text": "?", "owners": set()} for _ in range(self.bingo_size**2)]
+             self._index_cells()
              return 
 
         # Generate board items
@@ -111,14 +126,36 @@ class BingoGamemode(AbstractGamemode):
                 self.shared_cells.append({"text": items[item_idx], "owners": set()})
                 item_idx += 1
         
+        self._index_cells()
         self._initialized = True
 
+    def _index_cells(self):
+        self._board_message = None
+        free = [i for i, cell in enumerate(self.shared_cells) if cell.get('is_free')]
+        self.board = BingoBoard(self.bingo_size, free)
+        self._cells_by_text = {}
+        for i, cell in enumerate(self.shared_cells):
+            if not cell.get('is_free'):
+                self._cells_by_text.setdefault(normalize_cell_text(cell['text']), []).append(i)
+
+    def _ensure_board(self):
+        """Initialize and start if needed; True if that replaced the (placeholder) board."""
+        cells = self.shared_cells
+        self._ensure_initialized()
+        self._ensure_started()
+        return self.shared_cells is not cells
+
     def _ensure_started(self):
          if not self.timer_active:
             self.timer_active = True
             if self.timer_seconds > 0 and (self._loop_task is None or self._loop_task.done()):
                 self._loop_task = asyncio.create_task(self.game_loop())
 
+    def llm_priority(self, uuid):
+        if self.timer_active and not self.timer_disabled and self.timer_seconds > 0:
+            return PRIORITY_URGENT
+        return PRIORITY_NORMAL
+
     def _board_locked(self):
         return (not self.timer_disabled) and (self.timer_seconds <= 0 or not self.timer_active)
 
@@ -148,28 +185,44 @@ class BingoGamemode(AbstractGamemode):
         p = self.game_controller.players.get(uuid)
         return p.color if p else "#888888"
 
-    def get_bingo_field(self, uuid):
+    def _cell_payload(self, cell):
+        owners = list(cell['owners'])
+        payload = {
+            "text": cell['text'],
+            "owners": owners,
+            "done_colors": [self._get_player_color(uid) for uid in owners],
+        }
+        if cell.get('is_free'):
+            payload["free"] = True
+        return payload
+
+    def get_bingo_field(self, uuid=None):
+        """The board as every player sees it; clients derive their own ``done`` from ``owners``."""
         self._ensure_initialized()
         self._ensure_started()
-        
-        client_cells = []
-        for cell in self.shared_cells:
-            owners = list(cell['owners'])
-            done_colors = [self._get_player_color(uid) for uid in owners]
-            
-            is_free = cell.get('is_free', False)
-            client_cells.append({
-                "text": cell['text'],
-                "done": is_free or (uuid in cell['owners']),
-                "done_colors": done_colors,
-                "done_color": done_colors[0] if done_colors else None 
-            })
-            
         return {
             "size": self.bingo_size,
-            "cells": client_cells
+            "cells": [self._cell_payload(cell) for cell in self.shared_cells],
         }
 
+    def _bingo_message(self, uuid=None, field=None):
+        if field is not None:
+            return super()._bingo_message(uuid, field)
+        self._ensure_initialized()
+        self._ensure_started()
+        if self._board_message is None:
+            self._board_message = bingo(self.get_bingo_field())
+        return self._board_message
+
+    async def broadcast_bingo_field(self):
+        self._board_message = None
+        await self.send(self._bingo_message())
+
+    async def _broadcast_cells(self, indices):
+        self._board_message = None
+        for index in indices:
+            await self.send(bingo_cell(index, self._cell_payload(self.shared_cells[index])))
+
     async def handle_bingo_click(self, uuid, click_data):
         if not self.manual_mode:
             return 
@@ -177,32 +230,32 @@ class BingoGamemode(AbstractGamemode):
         if self._board_locked():
             return
 
-        self._ensure_initialized()
-        self._ensure_started()
+        regenerated = self._ensure_board()
         
         index = click_data.get('index')
         if index is None or index < 0 or index >= len(self.shared_cells):
-            return
-            
-        cell = self.shared_cells[index]
-        if cell.get('is_free'):
-            return
-
-        # Toggle logic
-        changed = False
-        if uuid in cell['owners']:
-             cell['owners'].remove(uuid)
-             changed = True
+            index = None
         else:
-             # Toggle On - Check Lockout
-             if self.lockout and len(cell['owners']) > 0:
-                 return # Locked out
-             
-             cell['owners'].add(uuid)
-             changed = True
-             
-        if changed:
+            cell = self.shared_cells[index]
+            if cell.get('is_free'):
+                index = None
+            # Toggle logic
+            elif uuid in cell['owners']:
+                 cell['owners'].remove(uuid)
+                 self.board.unclaim(uuid, index)
+            # Toggle On - Check Lockout
+            elif self.lockout and len(cell['owners']) > 0:
+                 index = None # Locked out
+            else:
+                 cell['owners'].add(uuid)
+                 self.board.claim(uuid, index)
+
+        if regenerated:
+            # Clients still show the placeholder board, so one cell is not enough
             await self.broadcast_bingo_field()
+        elif index is not None:
+            await self._broadcast_cells([index])
+        if index is not None:
             await self.check_winner(final=False)
 
     async def _add_item_and_notify(self, uuid, pair_id, new_item, cached):
@@ -216,37 +269,33 @@ class BingoGamemode(AbstractGamemode):
         if self._board_locked():
             return
 
-        changed = False
-        for cell in self.shared_cells:
-            if cell['text'] == item_name:
-                # If already owned by this user, ignore
-                if uuid in cell['owners']:
-                    continue
-                
-                # Check Lockout rules
-                if self.lockout and len(cell['owners']) > 0:
-                    # Already owned by someone else
-                    continue
-                
-                cell['owners'].add(uuid)
-                changed = True
+        regenerated = self._ensure_board()
+        changed = []
+        for index in self._cells_by_text.get(normalize_cell_text(item_name), ()):
+            cell = self.shared_cells[index]
+            # If already owned by this user, ignore
+            if uuid in cell['owners']:
+                continue
+
+            # Check Lockout rules
+            if self.lockout and len(cell['owners']) > 0:
+                # Already owned by someone else
+                continue
+
+            cell['owners'].add(uuid)
+            self.board.claim(uuid, index)
+            changed.append(index)
         
-        if changed:
+        if regenerated:
             await self.broadcast_bingo_field()
+        elif changed:
+            await self._broadcast_cells(changed)
+        if changed:
             await self.check_winner()
 
     async def check_winner(self, final=False):
-        user_indices = {}
-        for idx, cell in enumerate(self.shared_cells):
-            for owner in cell['owners']:
-                if owner not in user_indices: user_indices[owner] = set()
-                user_indices[owner].add(idx)
-
-        # Include free cells for everyone
-        free_indices = {i for i, c in enumerate(self.shared_cells) if c.get('is_free')}
-        if free_indices:
-            for uid in user_indices:
-                user_indices[uid] |= free_indices
+        # Cells held per player (free cells count for everyone who holds any)
+        cell_counts = {uid: self.board.cell_count(uid) for uid in self.board.players()}
 
         # Lockout mode: no bingo logic, decide only by most claimed fields
         if self.lockout:
@@ -255,8 +304,7 @@ class BingoGamemode(AbstractGamemode):
 
             max_count = 0
             winners = []
-            for uid, indices in user_indices.items():
-                count = len(indices)
+            for uid, count in cell_counts.items():
                 if count > max_count:
                     max_count = count
                     winners = [uid]
@@ -271,9 +319,7 @@ class BingoGamemode(AbstractGamemode):
             return
 
         # Count bingos for everyone
-        current_bingo_counts = {}
-        for uid, indices in user_indices.items():
-            current_bingo_counts[uid] = self._count_bingos(indices)
+        current_bingo_counts = {uid: self.board.bingo_count(uid) for uid in cell_counts}
 
         # Check for new bingos (Mid-game)
         if not final:
@@ -309,8 +355,8 @@ class BingoGamemode(AbstractGamemode):
                     return
                 
                 # Tie in bingos -> check items among the bingo winners
-                # Filter user_indices to only bingo_winners
-                user_indices = {uid: user_indices[uid] for uid in bingo_winners if uid in user_indices}
+                # Filter cell_counts to only bingo_winners
+                cell_counts = {uid: cell_counts[uid] for uid in bingo_winners if uid in cell_counts}
                 # Fall through to "most items" logic with filtered list
             else:
                 # No bingos at all -> Fall through to "most items" logic for everyone
@@ -319,8 +365,7 @@ class BingoGamemode(AbstractGamemode):
         # Standard "Most Items" check (used for tie-breaking or no bingos)
         max_count = 0
         winners = []
-        for uid, indices in user_indices.items():
-            count = len(indices)
+        for uid, count in cell_counts.items():
             if count > max_count:
                 max_count = count
                 winners = [uid]
@@ -336,26 +381,6 @@ class BingoGamemode(AbstractGamemode):
              names = [self.get_player_name(uid) for uid in winners]
              await self.send(news(f"Unentschieden: {', '.join(names)} ({max_count})"))
 
-    def _count_bingos(self, indices):
-        count = 0
-        # Rows
-        for i in range(self.bingo_size):
-            row_indices = set(range(i*self.bingo_size, (i+1)*self.bingo_size))
-            if row_indices.issubset(indices): count += 1
-        # Cols
-        for i in range(self.bingo_size):
-            col_indices = set(range(i, self.bingo_size*self.bingo_size, self.bingo_size))
-            if col_indices.issubset(indices): count += 1
-        # Diagonals
-        d1_indices = set(i*self.bingo_size + i for i in range(self.bingo_size))
-        if d1_indices.issubset(indices): count += 1
-        d2_indices = set(i*self.bingo_size + (self.bingo_size-1-i) for i in range(self.bingo_size))
-        if d2_indices.issubset(indices): count += 1
-        return count
-
-    def _has_bingo_indices(self, indices):
-        return self._count_bingos(indices) > 0
-
     async def finish(self):
         self.timer_active = False
         if self._loop_task:
@@ -2,18 +2,22 @@ import json
 import logging
 import os
 
+from combos import PLACEHOLDER_EMOJI
 from gamemodes.gamemode import AbstractGamemode
+from scheduler import PRIORITY_IDLE
 from templates import item
 
 log = logging.getLogger('ClassicGamemode')
 
 
 class ClassicGamemode(AbstractGamemode):
-    def __init__(self, game_controller):
-        super().__init__(game_controller, "Classic")
+    def __init__(self, game_controller, config=None):
+        super().__init__(game_controller, "Classic", config)
         self.item_pools = {}
         self.pool_file = os.getenv('CLASSIC_POOL_FILE', 'cache/classic_item_pools.json')
         self._load_pools()
+        self.game_controller.persistence.register(
+            'classic_pools', self.pool_file, self._snapshot_pools, ensure_ascii=False)
 
     def _default_pool(self):
         return [item("Water", "💧"), item("Fire", "🔥"), item("Earth", "🌍"), item("Air", "💨")]
@@ -31,7 +35,7 @@ class ClassicGamemode(AbstractGamemode):
                     cleaned = []
                     for entry in entries:
                         if isinstance(entry, dict) and entry.get('name'):
-                            cleaned.append(item(entry.get('name'), entry.get('emoji')))
+                            cleaned.append(item(entry.get('name'), entry.get('emoji') or PLACEHOLDER_EMOJI))
                     if cleaned:
                         self.item_pools[uuid] = cleaned
             else:
@@ -41,15 +45,28 @@ class ClassicGamemode(AbstractGamemode):
         except Exception as exc:  # pragma: no cover - defensive logging
             log.error('Failed to load classic item pools from %s: %s', self.pool_file, exc)
 
+    def _snapshot_pools(self):
+        # Placeholders are saved as missing so a later load never mistakes them for a resolved emoji
+        return {
+            uuid: [
+                item(entry.get('name'), None) if entry.get('emoji') == PLACEHOLDER_EMOJI else entry
+                for entry in pool
+            ]
+            for uuid, pool in list(self.item_pools.items())
+        }
+
     def _save_pools(self):
-        if not self.pool_file:
-            return
-        try:
-            os.makedirs(os.path.dirname(self.pool_file) or '.', exist_ok=True)
-            with open(self.pool_file, 'w', encoding='utf-8') as f:
-                json.dump(self.item_pools, f, ensure_ascii=False, indent=2)
-        except Exception as exc:  # pragma: no cover - defensive logging
-            log.error('Failed to save classic item pools to %s: %s', self.pool_file, exc)
+        self.game_controller.persistence.mark_dirty('classic_pools')
+
+    def llm_priority(self, uuid):
+        # Nothing is at stake in free play; timed modes go first
+        return PRIORITY_IDLE
+
+    def iter_item_pools(self):
+        return list(self.item_pools.values())
+
+    def save_item_pools(self):
+        self._save_pools()
 
     def get_item_pool(self, uuid):
         if uuid not in self.item_pools:
@@ -1,5 +1,12 @@
 import logging
-from templates import bingo, clear, gamemode, item, item_list, news, pair_empty_result, pair_result, username
+from combos import PLACEHOLDER_EMOJI, valid_single_emoji
+from poolsync import PoolHasher
+from ratelimit import default_limits, parse_limits
+from scheduler import PRIORITY_NORMAL
+from templates import (
+    bingo, clear, gamemode, item, item_list, item_update, items_add, items_up_to_date, news, pair_empty_result,
+    identity, pair_result, state, stopwatch, username,
+)
 
 log = logging.getLogger('AbstractGamemode')
 
@@ -7,9 +14,14 @@ log = logging.getLogger('AbstractGamemode')
 class AbstractGamemode:
     """Shared gamemode logic; subclasses only define item-pool strategy."""
 
-    def __init__(self, game_controller, mode_name: str):
+    def __init__(self, game_controller, mode_name: str, config=None):
         self.game_controller = game_controller
         self.mode_name = mode_name
+        # Event budgets: environment defaults, overridable through the gamemode config
+        self._rate_limits = {**default_limits(), **parse_limits((config or {}).get('rate_limits'))}
+        # uuid -> (pool list, version) last sent to that player; pools are append-only, so version = length
+        self._sent_item_lists = {}
+        self._pool_hasher = PoolHasher()
 
     async def start(self):
         log.info('%s started', self.mode_name)
@@ -34,9 +46,20 @@ class AbstractGamemode:
         log.info('%s paired %s with %s', self.get_player_name(uuid), item1, item2)
         await self.game_controller.request_combo(uuid, pair_id, item1, item2)
 
+    def rate_limit(self, kind):
+        """(tokens per second, burst) for an event kind, or None when unlimited."""
+        return self._rate_limits.get(kind)
+
+    def rate_limits(self):
+        return {kind: list(limit) for kind, limit in self._rate_limits.items()}
+
+    def llm_priority(self, uuid):
+        """Priority of this player's cache-miss LLM work in the controller's queue."""
+        return PRIORITY_NORMAL
+
     async def handle_combo(self, uuid, pair_id, item1, item2, result, cached):
         if result is None:
-            await self.send(pair_empty_result(pair_id), uuid)
+            await self.game_controller.pairs.deliver(uuid, pair_empty_result(pair_id))
             return
 
         new_item = item(result.get('name'), result.get('emoji'))
@@ -49,17 +72,25 @@ class AbstractGamemode:
     def get_bingo_field(self, uuid):
         raise NotImplementedError
 
-    async def send_bingo_field(self, uuid=None, field=None):
+    def _bingo_message(self, uuid=None, field=None):
         try:
-            target_field = field if field is not None else self.get_bingo_field(uuid)
+            return bingo(field if field is not None else self.get_bingo_field(uuid))
         except NotImplementedError:
-            return  # Gamemode doesn't support bingo fields
+            return None  # Gamemode doesn't support bingo fields
 
-        await self.send(bingo(target_field), uuid)
+    async def send_bingo_field(self, uuid=None, field=None):
+        message = self._bingo_message(uuid, field)
+        if message is not None:
+            await self.send(message, uuid)
 
     async def broadcast_bingo_field(self):
-        for player_uuid in self.game_controller.players:
-            await self.send_bingo_field(player_uuid)
+        messages = {}
+        for player_uuid in list(self.game_controller.players):
+            message = self._bingo_message(player_uuid)
+            if message is None:
+                return
+            messages[player_uuid] = message
+        await self.game_controller.send_each(messages)
 
     # --- Hooks for subclasses ---
     def get_item_pool(self, uuid):
@@ -69,26 +100,159 @@ class AbstractGamemode:
         raise NotImplementedError
 
     async def broadcast_item_list(self, uuid):
-        await self.send(item_list(self.get_item_pool(uuid)), uuid)
+        """Bring everyone who sees ``uuid``'s pool up to date after it changed."""
+        await self.sync_item_list(uuid)
+
+    async def sync_item_list(self, uuid, full=False):
+        """Send ``uuid`` the items added since its last update, or the whole pool when
+        ``full`` is set or the pool it was sent is no longer the current one."""
+        message = self._item_list_message(uuid, full)
+        if message is not None:
+            await self.send(message, uuid)
+
+    async def sync_item_lists(self, uuids):
+        """``sync_item_list`` for several players at once; players at the same version share one payload."""
+        memo = {}
+        messages = {}
+        for uuid in list(uuids):
+            message = self._item_list_message(uuid, memo=memo)
+            if message is not None:
+                messages[uuid] = message
+        await self.game_controller.send_each(messages)
+
+    def _item_list_message(self, uuid, full=False, memo=None):
+        pool = self.get_item_pool(uuid)
+        version = len(pool)
+        sent = self._sent_item_lists.get(uuid)
+        if full or sent is None or sent[0] is not pool or sent[1] > version:
+            key = (id(pool), None, version)
+        elif sent[1] == version:
+            return None
+        else:
+            key = (id(pool), sent[1], version)
+        message = memo.get(key) if memo is not None else None
+        if message is None:
+            if key[1] is None:
+                message = item_list(pool, version, self._pool_hasher.digest(pool))
+            else:
+                message = items_add(pool[sent[1]:], sent[1], version, self._pool_hasher.digest(pool))
+            if memo is not None:
+                memo[key] = message
+        self._sent_item_lists[uuid] = (pool, version)
+        return message
+
+    async def resume_item_list(self, uuid, known=None):
+        """Initial item list for a (re)joining player. ``known`` is the (version, hash) the
+        client has stored; if it is a prefix of the pool only the missing part is sent."""
+        await self.send(self._resume_item_message(uuid, known), uuid)
+
+    def _resume_item_message(self, uuid, known=None):
+        pool = self.get_item_pool(uuid)
+        if known is not None:
+            version, digest = known
+            if version <= len(pool) and self._pool_hasher.digest(pool, version) == digest:
+                self._sent_item_lists[uuid] = (pool, version)
+                if version == len(pool):
+                    return items_up_to_date(version, digest)
+                return self._item_list_message(uuid)
+        return self._item_list_message(uuid, full=True)
+
+    def iter_item_pools(self):
+        """Every distinct item pool that may need updating; persistent modes include offline players."""
+        seen = set()
+        for uuid in list(self.game_controller.players):
+            pool = self.get_item_pool(uuid)
+            if id(pool) not in seen:
+                seen.add(id(pool))
+                yield pool
+
+    def save_item_pools(self):
+        """Persist pools after an in-place change; no-op for modes that keep them in memory only."""
+
+    async def update_item_emoji(self, name, emoji):
+        """Swap in a late-resolved emoji and tell every player holding the item."""
+        await self.update_item_emojis({name: emoji})
+
+    async def update_item_emojis(self, emojis):
+        """Swap in late-resolved emoji (name -> emoji) in every pool, saving them once.
+
+        Each player holding a changed item gets an ``item_update`` for it;
+        players are sent one update per round so a large backfill does not
+        queue all of them in one go.
+        """
+        changed = set()
+        for pool in self.iter_item_pools():
+            touched = False
+            for entry in pool:
+                name = entry.get('name')
+                emoji = emojis.get(name)
+                if emoji is not None and entry.get('emoji') != emoji:
+                    entry['emoji'] = emoji
+                    changed.add(name)
+                    touched = True
+            if touched:
+                self._pool_hasher.invalidate(pool)
+        if not changed:
+            return
+        self.save_item_pools()
+        updates = {name: item_update(name, emojis[name]) for name in changed}
+        outstanding = {}
+        for uuid in list(self.game_controller.players):
+            names = list(dict.fromkeys(entry.get('name') for entry in self.get_item_pool(uuid)
+                                       if entry.get('name') in updates))
+            if names:
+                outstanding[uuid] = names
+        while outstanding:
+            # Players sharing the same next update share an emit
+            await self.game_controller.send_each({uuid: updates[names.pop()] for uuid, names in outstanding.items()})
+            outstanding = {uuid: names for uuid, names in outstanding.items() if names}
 
     # --- Internal helpers ---
     async def _add_item_and_notify(self, uuid, pair_id, new_item, cached):
+        pool = self.get_item_pool(uuid)
+        # Match by name so a placeholder or stale emoji never yields a second copy of an item
+        existing = next((entry for entry in pool if entry.get('name') == new_item.get('name')), None)
+        received = existing is None
+        if existing is not None:
+            emoji = new_item.get('emoji')
+            if emoji != existing.get('emoji') and emoji != PLACEHOLDER_EMOJI and valid_single_emoji(emoji):
+                # The entry was added with a placeholder or an older emoji; everyone holding it gets the new one
+                await self.update_item_emoji(existing.get('name'), emoji)
+                existing['emoji'] = emoji
+            new_item = existing
         self.add_item_to_pool(uuid, new_item)
-        await self.send(pair_result(pair_id, new_item, not cached), uuid)
+        await self.game_controller.pairs.deliver(uuid, pair_result(pair_id, new_item, not cached))
         await self.broadcast_item_list(uuid)
+        if received:
+            self.game_controller.prefetcher.on_new_item(uuid, new_item.get('name'), pool)
 
-    async def _send_state(self, uuid):
-        await self.send(clear(), uuid)
-        await self.send(gamemode(self.mode_name), uuid)
-        await self.send(username(self.get_player_name(uuid)), uuid)
-        await self.game_controller.send_stopwatch_state(uuid)
-        await self.broadcast_item_list(uuid)
-        await self.send_bingo_field(uuid)
-        await self.send(news(""), uuid)
+    def _shared_state_parts(self):
+        """State parts that are the same for every player; built once per broadcast."""
+        return {
+            'mode': gamemode(self.mode_name),
+            'stopwatch': stopwatch(self.game_controller.get_stopwatch_state()),
+            'news': news(""),
+        }
+
+    def _state_parts(self, uuid, shared):
+        """Everything a (re)joining player needs, in the order the client applies it."""
+        parts = [clear(), shared['mode'], username(self.get_player_name(uuid)), identity(uuid), shared['stopwatch'],
+                 self._resume_item_message(uuid, self.game_controller.take_known_items(uuid))]
+        field = self._bingo_message(uuid)
+        if field is not None:
+            parts.append(field)
+        parts.append(shared['news'])
+        return parts
+
+    async def _send_state(self, uuid, shared=None):
+        shared = shared if shared is not None else self._shared_state_parts()
+        await self.send(state(self._state_parts(uuid, shared)), uuid)
 
     async def _send_state_to_all(self):
-        for uuid in self.game_controller.players:
-            await self._send_state(uuid)
+        shared = self._shared_state_parts()
+        await self.game_controller.send_each({
+            uuid: state(self._state_parts(uuid, shared)) for uuid in list(self.game_controller.players)
+        })
 
     async def send(self, data, uuid=None):
         if uuid:
@@ -2,17 +2,19 @@ import json
 import logging
 import os
 from gamemodes.gamemode import AbstractGamemode
-from templates import item, item_list, news
+from templates import item, news
 
 log = logging.getLogger('SharedGamemode')
 
 
 class SharedGamemode(AbstractGamemode):
 
-    def __init__(self, game_controller):
-        super().__init__(game_controller, "Shared")
+    def __init__(self, game_controller, config=None):
+        super().__init__(game_controller, "Shared", config)
         self.pool_file = os.getenv('SHARED_POOL_FILE', 'cache/shared_item_pool.json')
         self.shared_item_pool = self._load_pool()
+        self.game_controller.persistence.register(
+            'shared_pool', self.pool_file, lambda: list(self.shared_item_pool), ensure_ascii=False)
         self._save_pool()
 
     def _default_pool(self):
@@ -39,14 +41,13 @@ class SharedGamemode(AbstractGamemode):
         return self._default_pool()
 
     def _save_pool(self):
-        if not self.pool_file:
-            return
-        try:
-            os.makedirs(os.path.dirname(self.pool_file) or '.', exist_ok=True)
-            with open(self.pool_file, 'w', encoding='utf-8') as f:
-                json.dump(self.shared_item_pool, f, ensure_ascii=False, indent=2)
-        except Exception as exc:
-            log.error('Failed to save shared item pool to %s: %s', self.pool_file, exc)
+        self.game_controller.persistence.mark_dirty('shared_pool')
+
+    def iter_item_pools(self):
+        return [self.shared_item_pool]
+
+    def save_item_pools(self):
+        self._save_pool()
 
     def get_item_pool(self, uuid):
         return self.shared_item_pool
@@ -61,5 +62,4 @@ class SharedGamemode(AbstractGamemode):
         await self.send(news(f"{self.get_player_name(uuid)} joined the game!"))
 
     async def broadcast_item_list(self, uuid):
-        for player_uuid in self.game_controller.players:
-            await self.send(item_list(self.shared_item_pool), player_uuid)
\ No newline at end of file
+        await self.sync_item_lists(self.game_controller.players)
\ No newline at end of file
@@ -1,6 +1,6 @@
 import logging
 from gamemodes.bingo import BingoGamemode
-from templates import item, item_list
+from templates import item
 
 log = logging.getLogger('SharedBingoGamemode')
 
@@ -21,5 +21,4 @@ class SharedBingoGamemode(BingoGamemode):
             self.shared_item_pool.append(new_item)
 
     async def broadcast_item_list(self, uuid):
-        for player_uuid in self.game_controller.players:
-            await self.send(item_list(self.shared_item_pool), player_uuid)
+        await self.sync_item_lists(self.game_controller.players)
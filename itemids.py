@@ -0,0 +1,86 @@
+from typing import Any, Dict, List, Optional
+
+_UNSENT = object()
+
+
+class ItemRegistry:
+    """Server-assigned integer ids for item names, for the compact wire protocol.
+
+    Ids are stable for the lifetime of the process. A compact session keeps
+    a dictionary of the ids (and emoji) it has been told about; ``encode``
+    replaces item references in an outgoing message by ids and attaches the
+    dictionary entries the session is missing as ``dict``, so every entry is
+    sent once per session and again only when its emoji changed.
+    """
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._names: List[str] = []
+
+    def id_for(self, name: str) -> int:
+        item_id = self._ids.get(name)
+        if item_id is None:
+            item_id = self._ids[name] = len(self._names)
+            self._names.append(name)
+        return item_id
+
+    def name_for(self, item_id: Any) -> Optional[str]:
+        if isinstance(item_id, int) and not isinstance(item_id, bool) and 0 <= item_id < len(self._names):
+            return self._names[item_id]
+        return None
+
+    def __len__(self):
+        return len(self._names)
+
+    def encode(self, message: Dict[str, Any], session: Dict[int, Optional[str]]) -> Dict[str, Any]:
+        """Compact copy of ``message`` for a session; the input is left untouched."""
+        kind = message.get('type')
+        data = message.get('data')
+        entries: List[list] = []
+
+        if kind == 'state' and isinstance(data, list):
+            # Parts share the envelope's dictionary, which the client reads before any part
+            parts = []
+            for part in data:
+                part = self.encode(part, session)
+                if 'dict' in part:
+                    part = dict(part)
+                    entries.extend(part.pop('dict'))
+                parts.append(part)
+            compact = {**message, 'data': parts}
+            if entries:
+                compact['dict'] = entries
+            return compact
+
+        def ref(name: Optional[str], emoji: Optional[str] = None, known_emoji: bool = True) -> int:
+            item_id = self.id_for(name)
+            sent = session.get(item_id, _UNSENT)
+            if sent is _UNSENT or (known_emoji and sent != emoji):
+                entries.append([item_id, name, emoji])
+                session[item_id] = emoji
+            return item_id
+
+        if kind == 'items' and isinstance(data, list):
+            data = [ref(entry.get('name'), entry.get('emoji')) for entry in data]
+        elif kind == 'items_add' and isinstance(data, dict):
+            data = {**data, 'items': [ref(entry.get('name'), entry.get('emoji')) for entry in data.get('items', [])]}
+        elif kind == 'pair_result' and isinstance(data, dict) and isinstance(data.get('new_item'), dict):
+            new_item = data['new_item']
+            data = {**data, 'new_item': ref(new_item.get('name'), new_item.get('emoji'))}
+        elif kind == 'item_update' and isinstance(data, dict):
+            ref(data.get('name'), data.get('emoji'))
+        elif kind == 'bingo' and isinstance(data, dict) and isinstance(data.get('cells'), list):
+            # Board words need not be items yet, so their emoji is not ours to overwrite
+            cells = []
+            for cell in data['cells']:
+                cell = dict(cell)
+                cell['id'] = ref(cell.pop('text', '') or '', known_emoji=False)
+                cells.append(cell)
+            data = {**data, 'cells': cells}
+        else:
+            return message
+
+        compact = {**message, 'data': data}
+        if entries:
+            compact['dict'] = entries
+        return compact
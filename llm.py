@@ -0,0 +1,448 @@
+import asyncio
+import importlib.util
+import json
+import logging
+import os
+import random
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+log = logging.getLogger('LLMClient')
+
+DEFAULT_LLM_URL = "https://openrouter.ai/api/v1/chat/completions"
+DEFAULT_LLM_MODEL = "openrouter/auto"
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        log.warning('Invalid value for %s, using %s', name, default)
+        return default
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        log.warning('Invalid value for %s, using %s', name, default)
+        return default
+
+
+def _env_flag(name: str) -> bool:
+    return os.getenv(name, '').lower() in ('1', 'true', 'yes', 'on')
+
+
+def extract_json_content(responseobj: Any, label: str = 'LLM') -> Optional[Dict[str, Any]]:
+    """Pull the JSON object out of a chat completion response body."""
+    if not isinstance(responseobj, dict):
+        log.error(f"Unexpected {label} JSON structure: {responseobj}")
+        return None
+
+    choices = responseobj.get("choices")
+    if not isinstance(choices, list) or not choices:
+        log.error(f"Missing or invalid 'choices' field in {label} response: {responseobj}")
+        return None
+
+    message = choices[0].get("message") if isinstance(choices[0], dict) else None
+    content = message.get("content") if isinstance(message, dict) else None
+    if not isinstance(content, str):
+        log.error(f"Missing or invalid {label} message content: {responseobj}")
+        return None
+
+    # Response may be wrapped in fenced code blocks
+    content = content.strip()
+    if content.startswith("```") and content.endswith("```"):
+        content = content[content.find('\n')+1:content.rfind("```")].strip()
+    try:
+        result = json.loads(content)
+    except Exception as e:
+        log.error(f"{label} message content is not valid JSON: {e}, body: {content!r}")
+        return None
+
+    if not isinstance(result, dict):
+        log.error(f"{label} message content is not a JSON object: {result}")
+        return None
+    return result
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: open after ``failure_threshold`` failures,
+    allow a single probe after ``cooldown`` seconds, close again on success."""
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 30.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if self.probing or time.monotonic() >= self.opened_at + self.cooldown:
+            return 'half_open'
+        return 'open'
+
+    def available(self) -> bool:
+        state = self.state
+        return state == 'closed' or (state == 'half_open' and not self.probing)
+
+    def acquire(self) -> bool:
+        state = self.state
+        if state == 'closed':
+            return True
+        if state == 'half_open' and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def release(self):
+        """Give back a probe slot without a verdict (e.g. the request was cancelled)."""
+        self.probing = False
+
+    def record(self, ok: bool):
+        if ok:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+            return
+        self.failures += 1
+        if self.probing or self.failures >= self.failure_threshold:
+            if self.opened_at is None or self.probing:
+                self.times_opened += 1
+            self.opened_at = time.monotonic()
+            self.probing = False
+
+
+class LLMEndpoint:
+    """One upstream url/model pair with rolling latency and error-rate estimates."""
+
+    ERROR_ALPHA = 0.2
+    ERROR_PENALTY = 4.0
+
+    def __init__(self, url: str, model: str, key: Optional[str], window: int = 50,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.url = url
+        self.model = model
+        self.key = key
+        self.breaker = breaker or CircuitBreaker()
+        self.latencies = deque(maxlen=window)
+        self.error_rate = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.in_flight = 0
+
+    @property
+    def name(self) -> str:
+        return f"{self.model}@{self.url}"
+
+    def record(self, latency: float, ok: bool):
+        self.requests += 1
+        if ok:
+            self.latencies.append(latency)
+        else:
+            self.failures += 1
+        self.error_rate += self.ERROR_ALPHA * ((0.0 if ok else 1.0) - self.error_rate)
+        self.breaker.record(ok)
+
+    def record_abandoned(self, elapsed: float):
+        # A request cancelled after losing a hedge race took at least this long
+        self.requests += 1
+        self.latencies.append(elapsed)
+        self.breaker.release()
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+        return ordered[index]
+
+    def score(self, default_latency: float) -> float:
+        """Lower is better. Endpoints that were never tried score 0 so they get explored."""
+        if not self.requests:
+            return 0.0
+        latency = self.percentile(50)
+        if latency is None:
+            latency = default_latency
+        return latency * (1 + self.ERROR_PENALTY * self.error_rate) * (1 + self.in_flight / 10)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "requests": self.requests,
+            "failures": self.failures,
+            "error_rate": round(self.error_rate, 3),
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "in_flight": self.in_flight,
+            "breaker": self.breaker.state,
+            "breaker_opened": self.breaker.times_opened,
+        }
+
+
+def endpoints_from_env() -> List[LLMEndpoint]:
+    """Read LLM_ENDPOINTS (JSON list of urls or {url, model, key} objects), else LLM_API_URL/LLM_MODEL."""
+    default_url = os.getenv("LLM_API_URL") or DEFAULT_LLM_URL
+    default_model = os.getenv("LLM_MODEL") or DEFAULT_LLM_MODEL
+    default_key = os.getenv("LLM_KEY")
+    failure_threshold = _env_int('LLM_BREAKER_FAILURES', 5)
+    cooldown = _env_float('LLM_BREAKER_COOLDOWN', 30.0)
+    raw = os.getenv('LLM_ENDPOINTS')
+    endpoints: List[LLMEndpoint] = []
+    if raw:
+        try:
+            entries = json.loads(raw)
+        except json.JSONDecodeError as e:
+            log.error(f"LLM_ENDPOINTS is not valid JSON: {e}")
+            entries = []
+        if not isinstance(entries, list):
+            log.error("LLM_ENDPOINTS must be a JSON list")
+            entries = []
+        for entry in entries:
+            if isinstance(entry, str):
+                entry = {"url": entry}
+            if not isinstance(entry, dict) or not isinstance(entry.get("url"), str):
+                log.error(f"Skipping invalid LLM endpoint entry: {entry!r}")
+                continue
+            endpoints.append(LLMEndpoint(
+                entry["url"],
+                entry.get("model") or default_model,
+                entry.get("key") or default_key,
+                breaker=CircuitBreaker(failure_threshold, cooldown),
+            ))
+    if not endpoints:
+        endpoints.append(LLMEndpoint(default_url, default_model, default_key,
+                                     breaker=CircuitBreaker(failure_threshold, cooldown)))
+    return endpoints
+
+
+class LLMClient:
+    """Long-lived chat completion client shared by all LLM lookups.
+
+    Keeps one pooled ``httpx.AsyncClient`` (keep-alive, optional HTTP/2),
+    caps simultaneous upstream requests with a semaphore and retries
+    transient failures (429/5xx, connection errors) with jittered backoff.
+    Requests go to the endpoint with the best rolling latency/error score;
+    endpoints whose circuit breaker is open are skipped, and when all are
+    open requests fail immediately instead of waiting for timeouts.
+    With hedging enabled, a second request is sent to the next-best endpoint
+    when the first has not answered within a percentile of its latency; the
+    first valid answer wins and the other request is cancelled.
+    """
+
+    def __init__(self, endpoints: List[LLMEndpoint], max_concurrency: int = 16, max_keepalive: int = 16,
+                 http2: bool = False, connect_timeout: float = 5.0, read_timeout: float = 30.0,
+                 write_timeout: float = 10.0, pool_timeout: float = 10.0, max_retries: int = 2,
+                 backoff_base: float = 0.5, backoff_max: float = 8.0, hedge: bool = False,
+                 hedge_percentile: float = 95.0, hedge_min_delay: float = 0.5, hedge_default_delay: float = 3.0):
+        self.endpoints = endpoints
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_default_delay = hedge_default_delay
+        self.hedges_sent = 0
+        self.hedges_won = 0
+        # Reported by the upstream ``usage`` block; lets batch tools enforce a spend limit
+        self.tokens_used = 0
+        if http2 and importlib.util.find_spec('h2') is None:
+            log.warning('LLM_HTTP2 requested but the h2 package is not installed, using HTTP/1.1')
+            http2 = False
+        self.http2 = http2
+        self.max_concurrency = max(1, max_concurrency)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._in_flight = 0
+        self._client = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=self.max_concurrency,
+                max_keepalive_connections=max(1, min(max_keepalive, self.max_concurrency)),
+            ),
+            timeout=httpx.Timeout(connect=connect_timeout, read=read_timeout, write=write_timeout, pool=pool_timeout),
+        )
+
+    @classmethod
+    def from_env(cls) -> 'LLMClient':
+        return cls(
+            endpoints=endpoints_from_env(),
+            max_concurrency=_env_int('LLM_MAX_CONCURRENCY', 16),
+            max_keepalive=_env_int('LLM_MAX_KEEPALIVE', 16),
+            http2=_env_flag('LLM_HTTP2'),
+            connect_timeout=_env_float('LLM_CONNECT_TIMEOUT', 5.0),
+            read_timeout=_env_float('LLM_READ_TIMEOUT', 30.0),
+            write_timeout=_env_float('LLM_WRITE_TIMEOUT', 10.0),
+            pool_timeout=_env_float('LLM_POOL_TIMEOUT', 10.0),
+            max_retries=_env_int('LLM_MAX_RETRIES', 2),
+            backoff_base=_env_float('LLM_BACKOFF_BASE', 0.5),
+            backoff_max=_env_float('LLM_BACKOFF_MAX', 8.0),
+            hedge=_env_flag('LLM_HEDGE'),
+            hedge_percentile=_env_float('LLM_HEDGE_PERCENTILE', 95.0),
+            hedge_min_delay=_env_float('LLM_HEDGE_MIN_DELAY', 0.5),
+            hedge_default_delay=_env_float('LLM_HEDGE_DEFAULT_DELAY', 3.0),
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self._in_flight,
+            "max_concurrency": self.max_concurrency,
+            "http2": self.http2,
+            "hedge": self.hedge,
+            "hedges_sent": self.hedges_sent,
+            "hedges_won": self.hedges_won,
+            "tokens_used": self.tokens_used,
+            "endpoints": [endpoint.stats() for endpoint in self.endpoints],
+        }
+
+    def _ranked_endpoints(self) -> List[LLMEndpoint]:
+        usable = [endpoint for endpoint in self.endpoints
+                  if endpoint.key and endpoint.url and endpoint.breaker.available()]
+        return sorted(usable, key=lambda endpoint: endpoint.score(self.hedge_default_delay))
+
+    def _hedge_delay(self, endpoint: LLMEndpoint) -> float:
+        delay = endpoint.percentile(self.hedge_percentile) if len(endpoint.latencies) >= 5 else None
+        if delay is None:
+            delay = self.hedge_default_delay
+        return max(self.hedge_min_delay, delay)
+
+    def _backoff(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            try:
+                return min(self.backoff_max, max(0.0, float(retry_after)))
+            except (TypeError, ValueError):
+                pass
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.5)
+
+    async def _post(self, endpoint: LLMEndpoint, payload: Dict[str, Any], label: str) -> Optional[httpx.Response]:
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            async with self._semaphore:
+                self._in_flight += 1
+                endpoint.in_flight += 1
+                try:
+                    response = await self._client.post(
+                        endpoint.url,
+                        json=payload,
+                        headers={"Authorization": f"Bearer {endpoint.key}"},
+                    )
+                except httpx.TransportError as e:
+                    if last_attempt:
+                        log.error(f"Network error requesting {label} from {endpoint.name}: {e}")
+                        return None
+                    log.warning(f"Network error requesting {label} from {endpoint.name} (attempt {attempt + 1}), retrying: {e}")
+                    response = None
+                except httpx.RequestError as e:
+                    log.error(f"Network error requesting {label} from {endpoint.name}: {e}")
+                    return None
+                finally:
+                    self._in_flight -= 1
+                    endpoint.in_flight -= 1
+
+            if response is not None:
+                if response.status_code not in RETRY_STATUS_CODES or last_attempt:
+                    return response
+                log.warning(f"{label} request to {endpoint.name} returned {response.status_code} (attempt {attempt + 1}), retrying")
+            await asyncio.sleep(self._backoff(attempt, response))
+        return None
+
+    async def _attempt(self, endpoint: LLMEndpoint, system_prompt: str, user_prompt: str,
+                       label: str) -> Optional[Dict[str, Any]]:
+        payload = {
+            "model": endpoint.model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            "response_format": {"type": "json_object"},
+            "stream": False,
+        }
+        log.debug(f"{label} payload for {endpoint.name}: {payload}")
+
+        if not endpoint.breaker.acquire():
+            log.warning(f"Skipping {label} request, circuit for {endpoint.name} is {endpoint.breaker.state}")
+            return None
+        started = time.monotonic()
+        result = None
+        try:
+            response = await self._post(endpoint, payload, label)
+            if response is None:
+                return None
+
+            if response.status_code != 200:
+                log.error(f"{label} request failed: {response.status_code} {response.text}")
+                return None
+
+            try:
+                responseobj = response.json()
+            except Exception as e:
+                log.error(f"{label} response is not valid JSON: {e}, body: {response.text[:200]!r}")
+                return None
+
+            usage = responseobj.get("usage") if isinstance(responseobj, dict) else None
+            if isinstance(usage, dict) and isinstance(usage.get("total_tokens"), int):
+                self.tokens_used += usage["total_tokens"]
+            result = extract_json_content(responseobj, label)
+            return result
+        except asyncio.CancelledError:
+            endpoint.record_abandoned(time.monotonic() - started)
+            started = None
+            raise
+        finally:
+            if started is not None:
+                endpoint.record(time.monotonic() - started, result is not None)
+
+    async def _hedged(self, primary: LLMEndpoint, backup: LLMEndpoint, system_prompt: str, user_prompt: str,
+                      label: str) -> Optional[Dict[str, Any]]:
+        first = asyncio.ensure_future(self._attempt(primary, system_prompt, user_prompt, label))
+        second = None
+        try:
+            done, _ = await asyncio.wait({first}, timeout=self._hedge_delay(primary))
+            if first in done and first.result() is not None:
+                return first.result()
+
+            log.info(f"Hedging {label} request to {backup.name}")
+            self.hedges_sent += 1
+            second = asyncio.ensure_future(self._attempt(backup, system_prompt, user_prompt, label))
+            pending = {task for task in (first, second) if not task.done()}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.result() is not None:
+                        if task is second:
+                            self.hedges_won += 1
+                        return task.result()
+            return None
+        finally:
+            for task in (first, second):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    async def complete_json(self, system_prompt: str, user_prompt: str, label: str = 'LLM') -> Optional[Dict[str, Any]]:
+        """Send one chat completion and return the JSON object from its content, or None on failure."""
+        if not any(endpoint.key for endpoint in self.endpoints):
+            log.error("LLM_KEY environment variable not set")
+            return None
+        endpoints = self._ranked_endpoints()
+        if not endpoints:
+            log.warning(f"Failing {label} request fast, all LLM endpoint circuits are open")
+            return None
+
+        primary = endpoints[0]
+        if not self.hedge:
+            return await self._attempt(primary, system_prompt, user_prompt, label)
+        backup = endpoints[1] if len(endpoints) > 1 else primary
+        return await self._hedged(primary, backup, system_prompt, user_prompt, label)
+
+    async def aclose(self):
+        await self._client.aclose()
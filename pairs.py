@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from templates import pair_empty_result, pair_pending, pair_timeout
+
+log = logging.getLogger('PairPipeline')
+
+
+class _PendingPair:
+    __slots__ = ('request_id', 'uuid', 'pair_id', 'item1', 'item2', 'deadline_at', 'timer')
+
+    def __init__(self, request_id: int, uuid: str, pair_id: int, item1: str, item2: str, deadline_at: Optional[float]):
+        self.request_id = request_id
+        self.uuid = uuid
+        self.pair_id = pair_id
+        self.item1 = item1
+        self.item2 = item2
+        self.deadline_at = deadline_at
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class PairPipeline:
+    """Decouples pair requests from the socket event that carried them.
+
+    ``submit`` acknowledges a pair with ``pair_pending`` (carrying a server
+    side request id) and resolves it in a background task; the gamemode
+    hands its answer to ``deliver``. Answers and timeouts for players who
+    are offline at that moment are buffered and sent again by ``redeliver``
+    when they rejoin. A deadline timer sends ``pair_timeout`` so the client
+    can give up without the server keeping a coroutine waiting on it.
+    """
+
+    def __init__(self, controller, deadline: float = 30.0, max_undelivered: int = 50, retention: float = 600.0):
+        self.controller = controller
+        self.deadline = max(0.0, deadline)
+        self.max_undelivered = max(1, max_undelivered)
+        self.retention = max(0.0, retention)
+        self._open: Dict[Tuple[str, int], _PendingPair] = {}
+        self._undelivered: Dict[str, Deque[Dict[str, Any]]] = {}
+        # uuid -> monotonic time its buffer last grew; buffers of players gone longer than ``retention`` are dropped
+        self._buffered_at: Dict[str, float] = {}
+        self._tasks = set()
+        self._serial = 0
+        self.timeouts = 0
+        self.redelivered = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "deadline": self.deadline,
+            "open": len(self._open),
+            "undelivered": sum(len(messages) for messages in self._undelivered.values()),
+            "timeouts": self.timeouts,
+            "redelivered": self.redelivered,
+        }
+
+    async def submit(self, uuid: str, pair_id: int, item1: str, item2: str):
+        self._serial += 1
+        deadline_at = time.monotonic() + self.deadline if self.deadline else None
+        request = _PendingPair(self._serial, uuid, pair_id, item1, item2, deadline_at)
+        previous = self._open.pop((uuid, pair_id), None)
+        if previous is not None and previous.timer is not None:
+            previous.timer.cancel()
+        self._open[(uuid, pair_id)] = request
+        if self.deadline:
+            request.timer = asyncio.get_running_loop().call_later(self.deadline, self._expire, request)
+
+        await self.controller.send_to_uuid(uuid, pair_pending(pair_id, request.request_id, self.deadline or None))
+        task = asyncio.ensure_future(self._run(request))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, request: _PendingPair):
+        try:
+            await self.controller.gamemode.pair(request.uuid, request.pair_id, request.item1, request.item2)
+        except Exception:
+            log.exception('Pair %s of %s failed', request.request_id, request.uuid)
+            await self.deliver(request.uuid, pair_empty_result(request.pair_id))
+
+    async def deliver(self, uuid: str, message: Dict[str, Any]):
+        """Send a pair answer, or keep it for the player's next join if they are offline."""
+        pair_id = message.get('data', {}).get('id')
+        request = self._open.get((uuid, pair_id))
+        if request is None:
+            # Already timed out (or never tracked); the client only still cares if it is listening
+            if uuid in self.controller.players:
+                await self.controller.send_to_uuid(uuid, message)
+            return
+        del self._open[(uuid, pair_id)]
+        if request.timer is not None:
+            request.timer.cancel()
+        message['data']['request_id'] = request.request_id
+        await self._send_or_buffer(uuid, message)
+
+    def _expire(self, request: _PendingPair):
+        key = (request.uuid, request.pair_id)
+        if self._open.get(key) is not request:
+            return
+        del self._open[key]
+        self.timeouts += 1
+        log.info('Pair %s of %s passed its deadline', request.request_id, request.uuid)
+        task = asyncio.ensure_future(
+            self._send_or_buffer(request.uuid, pair_timeout(request.pair_id, request.request_id)))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send_or_buffer(self, uuid: str, message: Dict[str, Any]):
+        if uuid in self.controller.players:
+            await self.controller.send_to_uuid(uuid, message)
+            return
+        self.prune()
+        buffered = self._undelivered.setdefault(uuid, deque(maxlen=self.max_undelivered))
+        buffered.append(message)
+        self._buffered_at[uuid] = time.monotonic()
+
+    def prune(self):
+        """Drop buffered answers of players who have not come back within ``retention``."""
+        cutoff = time.monotonic() - self.retention
+        for uuid in [uuid for uuid, buffered_at in self._buffered_at.items() if buffered_at < cutoff]:
+            self._undelivered.pop(uuid, None)
+            del self._buffered_at[uuid]
+
+    def reset(self):
+        """Forget every buffered answer, e.g. when the gamemode changes and old pairs mean nothing."""
+        self._undelivered.clear()
+        self._buffered_at.clear()
+
+    async def redeliver(self, uuid: str):
+        """Replay buffered answers and re-acknowledge still-open requests after a (re)join."""
+        self._buffered_at.pop(uuid, None)
+        for message in self._undelivered.pop(uuid, ()):
+            self.redelivered += 1
+            await self.controller.send_to_uuid(uuid, message)
+        now = time.monotonic()
+        for request in [request for request in self._open.values() if request.uuid == uuid]:
+            remaining = max(0.0, request.deadline_at - now) if request.deadline_at is not None else None
+            await self.controller.send_to_uuid(uuid, pair_pending(request.pair_id, request.request_id, remaining))
@@ -0,0 +1,156 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Optional
+
+log = logging.getLogger('Persistence')
+
+
+def write_json_atomic(path: str, data: Any, ensure_ascii: bool = True, indent: Optional[int] = 2):
+    """Write JSON to a temp file next to ``path`` and rename it into place."""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=ensure_ascii, indent=indent)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates 0600 files; keep the mode of the file being replaced
+        try:
+            mode = os.stat(path).st_mode & 0o777
+        except FileNotFoundError:
+            mode = 0o644
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+@dataclass
+class _Target:
+    path: str
+    snapshot: Callable[[], Any]
+    ensure_ascii: bool = True
+    indent: Optional[int] = 2
+
+
+class PersistenceScheduler:
+    """Write-behind JSON persistence.
+
+    Callers mark a registered target dirty instead of writing it. A daemon
+    thread waits until no new marks arrived for ``delay`` seconds (or until
+    ``max_delay`` passed since the first unflushed mark) and then writes every
+    dirty target once. ``snapshot`` callables run on that thread, so they must
+    return a copy that is safe to serialize while the game keeps mutating the
+    original (``dict(d)`` / ``list(l)`` are atomic in CPython).
+    """
+
+    def __init__(self, delay: float = 2.0, max_delay: float = 10.0):
+        self.delay = delay
+        self.max_delay = max_delay
+        self._targets: Dict[str, _Target] = {}
+        self._dirty = set()
+        self._first_dirty_at: Optional[float] = None
+        self._last_dirty_at: Optional[float] = None
+        self._stopped = False
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self, name: str, path: Optional[str], snapshot: Callable[[], Any],
+                 ensure_ascii: bool = True, indent: Optional[int] = 2):
+        if not path:
+            return
+        with self._cond:
+            self._targets[name] = _Target(path, snapshot, ensure_ascii, indent)
+
+    def mark_dirty(self, name: str):
+        with self._cond:
+            if name not in self._targets:
+                return
+            now = time.monotonic()
+            if not self._dirty:
+                self._first_dirty_at = now
+            self._dirty.add(name)
+            self._last_dirty_at = now
+            self._cond.notify()
+
+    def flush(self, names: Optional[Iterable[str]] = None, all_targets: bool = False) -> bool:
+        """Synchronously write dirty targets (or the given ones) on the calling thread.
+
+        Returns False if any target failed to write; failed targets stay dirty.
+        """
+        with self._cond:
+            if all_targets:
+                selected = set(self._targets)
+            elif names is None:
+                selected = set(self._dirty)
+            else:
+                selected = set(names) & set(self._targets)
+            self._dirty -= selected
+            if not self._dirty:
+                self._first_dirty_at = None
+                self._last_dirty_at = None
+            targets = {name: self._targets[name] for name in selected}
+        return self._write(targets)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name='persistence', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread and write whatever is still dirty."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=30)
+        self.flush()
+
+    def _due_in(self) -> Optional[float]:
+        if not self._dirty:
+            return None
+        now = time.monotonic()
+        return max(0.0, min(self._last_dirty_at + self.delay, self._first_dirty_at + self.max_delay) - now)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    wait = self._due_in()
+                    if wait == 0.0:
+                        break
+                    self._cond.wait(wait)
+                if self._stopped:
+                    return
+            try:
+                self.flush()
+            except Exception:  # pragma: no cover - defensive logging
+                log.exception('Background flush failed')
+
+    def _write(self, targets: Dict[str, _Target]) -> bool:
+        ok = True
+        with self._write_lock:
+            for name, target in targets.items():
+                started = time.monotonic()
+                try:
+                    write_json_atomic(target.path, target.snapshot(), target.ensure_ascii, target.indent)
+                except Exception as exc:
+                    log.error('Failed to persist %s to %s: %s', name, target.path, exc)
+                    self.mark_dirty(name)
+                    ok = False
+                    continue
+                log.debug('Persisted %s to %s in %.1f ms', name, target.path, (time.monotonic() - started) * 1000)
+        return ok
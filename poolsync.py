@@ -0,0 +1,48 @@
+import hashlib
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def _entry_bytes(entry: Dict[str, Any]) -> bytes:
+    return f"{entry.get('name') or ''}\x1f{entry.get('emoji') or ''}\x1e".encode('utf-8')
+
+
+def parse_known_items(raw: Any) -> Optional[Tuple[int, str]]:
+    """(version, hash) from a join payload's ``items`` entry, or None if missing or malformed."""
+    if not isinstance(raw, dict):
+        return None
+    version = raw.get('version')
+    digest = raw.get('hash')
+    if isinstance(version, int) and not isinstance(version, bool) and version > 0 and isinstance(digest, str):
+        return version, digest
+    return None
+
+
+class PoolHasher:
+    """Prefix hashes of append-only item pools.
+
+    ``digest(pool, version)`` identifies the first ``version`` entries (name
+    and emoji) of a pool. A running hash per pool makes the common case,
+    hashing the current pool after a few appends, cost only the new
+    entries; hashing an older prefix (a client's stored version) starts
+    over. Call ``invalidate`` after changing entries in place.
+    """
+
+    def __init__(self):
+        # id(pool) -> (pool, hashed length, running hash)
+        self._running: Dict[int, Tuple[List[Dict[str, Any]], int, Any]] = {}
+
+    def digest(self, pool: List[Dict[str, Any]], version: Optional[int] = None) -> str:
+        version = len(pool) if version is None else version
+        state = self._running.get(id(pool))
+        if state is not None and state[0] is pool and state[1] <= version:
+            hasher, start = state[2].copy(), state[1]
+        else:
+            hasher, start = hashlib.blake2b(digest_size=8), 0
+        for entry in pool[start:version]:
+            hasher.update(_entry_bytes(entry))
+        if version == len(pool):
+            self._running[id(pool)] = (pool, version, hasher.copy())
+        return hasher.hexdigest()
+
+    def invalidate(self, pool: List[Dict[str, Any]]):
+        self._running.pop(id(pool), None)
@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import time
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, Tuple
+
+log = logging.getLogger('Prefetcher')
+
+
+class Prefetcher:
+    """Speculatively resolves combos a player is likely to try next.
+
+    When a player receives an item, pairs of that item with the player's
+    most-used pool items are queued. A single background worker looks them
+    up at background priority, only while the LLM queue is idle and only as
+    far as the hourly budget allows, so interactive requests always win.
+    """
+
+    def __init__(self, controller, per_hour: float = 0.0, fanout: int = 6, max_pending: int = 200,
+                 idle_poll: float = 1.0):
+        self.controller = controller
+        self.per_hour = max(0.0, per_hour)
+        self.fanout = max(1, fanout)
+        self.idle_poll = idle_poll
+        self.burst = float(self.fanout)
+        self._tokens = self.burst
+        self._refilled_at = time.monotonic()
+        self._pending: Deque[Tuple[str, str, str]] = deque(maxlen=max(1, max_pending))
+        self._usage: Dict[str, Counter] = {}
+        # Keys prefetched but not yet asked for, oldest first; only kept to count hits
+        self._prefetched: Dict[str, None] = {}
+        self._max_prefetched = max(1, max_pending) * 5
+        self._worker = None
+        self.prefetched = 0
+        self.hits = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.per_hour > 0
+
+    def stats(self) -> Dict[str, Any]:
+        self._refill()
+        return {
+            "enabled": self.enabled,
+            "per_hour": self.per_hour,
+            "tokens": round(self._tokens, 2),
+            "pending": len(self._pending),
+            "prefetched": self.prefetched,
+            "hits": self.hits,
+        }
+
+    def record_use(self, uuid: str, item1: str, item2: str):
+        """Count which items a player combines and whether a prefetch paid off."""
+        if not self.enabled:
+            return
+        usage = self._usage.setdefault(uuid, Counter())
+        usage[item1] += 1
+        usage[item2] += 1
+        key = self.controller.cache._normalize_key(item1, item2)
+        if key in self._prefetched:
+            del self._prefetched[key]
+            self.hits += 1
+
+    def forget(self, uuid: str):
+        """Drop a departed player's usage counts and queued candidates."""
+        self._usage.pop(uuid, None)
+        if any(entry[0] == uuid for entry in self._pending):
+            kept = [entry for entry in self._pending if entry[0] != uuid]
+            self._pending.clear()
+            self._pending.extend(kept)
+
+    def on_new_item(self, uuid: str, name: str, pool: List[Dict[str, Any]]):
+        if not self.enabled or not isinstance(name, str):
+            return
+        usage = self._usage.get(uuid, Counter())
+        others = [entry.get('name') for entry in pool if entry.get('name') and entry.get('name') != name]
+        # Stable sort keeps pool order (oldest first) among equally used items
+        others.sort(key=lambda other: usage.get(other, 0), reverse=True)
+        partners = [name] + others[:self.fanout - 1]
+        # Newest discoveries first; the deque drops the stalest candidates when full
+        for partner in reversed(partners):
+            self._pending.appendleft((uuid, name, partner))
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.ensure_future(self._run())
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.per_hour / 3600)
+        self._refilled_at = now
+
+    def _worth_fetching(self, item1: str, item2: str) -> bool:
+        controller = self.controller
+        key = controller.cache._normalize_key(item1, item2)
+        return (
+            controller.cache.get_combo(item1, item2) is None
+            and key not in controller._inflight_combos
+            and not controller._recently_failed(key)
+        )
+
+    async def _run(self):
+        while self._pending:
+            if self.controller.llm_queue.busy():
+                await asyncio.sleep(self.idle_poll)
+                continue
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) * 3600 / self.per_hour)
+                continue
+
+            uuid, item1, item2 = self._pending.popleft()
+            if not self._worth_fetching(item1, item2):
+                continue
+            self._tokens -= 1
+            self.prefetched += 1
+            self._prefetched[self.controller.cache._normalize_key(item1, item2)] = None
+            if len(self._prefetched) > self._max_prefetched:
+                del self._prefetched[next(iter(self._prefetched))]
+            log.debug('Prefetching %s and %s for %s', item1, item2, uuid)
+            try:
+                await self.controller.prefetch_combo(uuid, item1, item2)
+            except Exception:
+                log.exception('Prefetch of %s and %s failed', item1, item2)
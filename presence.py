@@ -0,0 +1,62 @@
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
+from templates import users, users_join, users_leave
+
+log = logging.getLogger('Presence')
+
+
+class PresenceBroadcaster:
+    """Coalesces player list changes into ``users_join``/``users_leave`` deltas.
+
+    A joining player is sent the full list right away. Everyone else hears
+    about changes at most once per ``window``: the flush compares the
+    current players with what was last announced, so a player who drops and
+    comes back within the window causes no message at all, and a burst of
+    reconnects costs one delta per player instead of a full list per join.
+    """
+
+    def __init__(self, controller, window: float = 0.25):
+        self.controller = controller
+        self.window = max(0.0, window)
+        # uuid -> entry as last announced to everyone
+        self._announced: Dict[str, Dict[str, Any]] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+        self.flushes = 0
+        self.deltas = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {"window": self.window, "flushes": self.flushes, "deltas": self.deltas}
+
+    async def joined(self, uuid: str):
+        await self.controller.send_to_uuid(uuid, users(self.controller.user_list()))
+        self.changed()
+
+    def changed(self):
+        """Note that the player list changed; the delta goes out when the window closes."""
+        if self._flush_handle is not None:
+            return
+        self._flush_handle = asyncio.get_running_loop().call_later(self.window, self._schedule_flush)
+
+    def _schedule_flush(self):
+        task = asyncio.ensure_future(self.flush())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        current = {entry['uuid']: entry for entry in self.controller.user_list()}
+        joined = [entry for uuid, entry in current.items() if self._announced.get(uuid) != entry]
+        left = [uuid for uuid in self._announced if uuid not in current]
+        self._announced = current
+        self.flushes += 1
+        if joined:
+            self.deltas += 1
+            await self.controller.send_to_all(users_join(joined))
+        if left:
+            self.deltas += 1
+            await self.controller.send_to_all(users_leave(left))
@@ -0,0 +1,152 @@
+import logging
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+log = logging.getLogger('RateLimiter')
+
+EVENT_PAIR_HIT = 'pair_hit'
+EVENT_PAIR_MISS = 'pair_miss'
+EVENT_BINGO_CLICK = 'bingo_click'
+EVENT_ITEMS_RESYNC = 'items_resync'
+
+Limit = Tuple[float, float]
+
+
+def _env_limit(name: str, default: Limit) -> Limit:
+    """Parse ``<tokens per second>,<burst>``; a rate of 0 disables the limit."""
+    raw = os.getenv(name)
+    if not raw:
+        return default
+    try:
+        rate, burst = (float(part) for part in raw.split(','))
+        return rate, burst
+    except ValueError:
+        log.warning('Ignoring invalid %s=%r, expected "<per second>,<burst>"', name, raw)
+        return default
+
+
+def default_limits() -> Dict[str, Limit]:
+    return {
+        # Cache hits cost a lookup; misses can cost an LLM call each
+        EVENT_PAIR_HIT: _env_limit('RATE_LIMIT_PAIR_HIT', (5.0, 20.0)),
+        EVENT_PAIR_MISS: _env_limit('RATE_LIMIT_PAIR_MISS', (0.5, 6.0)),
+        EVENT_BINGO_CLICK: _env_limit('RATE_LIMIT_BINGO_CLICK', (4.0, 8.0)),
+        # Each resync sends the whole pool
+        EVENT_ITEMS_RESYNC: _env_limit('RATE_LIMIT_ITEMS_RESYNC', (0.2, 3.0)),
+    }
+
+
+def parse_limits(raw: Any) -> Dict[str, Limit]:
+    """Read ``{"pair_miss": [rate, burst], ...}`` from a gamemode config, skipping bad entries."""
+    limits: Dict[str, Limit] = {}
+    if not isinstance(raw, dict):
+        return limits
+    for kind, value in raw.items():
+        try:
+            rate, burst = (float(part) for part in value)
+        except (TypeError, ValueError):
+            log.warning('Ignoring invalid rate limit for %s: %r', kind, value)
+            continue
+        limits[str(kind)] = (rate, burst)
+    return limits
+
+
+class TokenBucket:
+    __slots__ = ('rate', 'burst', 'tokens', 'updated_at')
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.updated_at = time.monotonic()
+
+    def refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def retry_after(self) -> float:
+        return (1 - self.tokens) / self.rate if self.tokens < 1 else 0.0
+
+
+class RateLimiter:
+    """Token buckets per event kind and key (one per sid and one per uuid).
+
+    An event is admitted only if every key's bucket has a token, and then
+    takes one from each, so reconnecting with a fresh sid does not reset a
+    player's budget and several tabs of one player share it.
+
+    Buckets that have refilled completely are dropped every
+    ``prune_interval`` seconds; a new bucket starts full, so this loses
+    nothing, and keys that stop sending (e.g. uuids a client made up) do not
+    pile up. At most ``max_tracked_keys`` keys keep a rejection count.
+    """
+
+    def __init__(self, prune_interval: float = 60.0, max_tracked_keys: int = 1000):
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self.prune_interval = prune_interval
+        self.max_tracked_keys = max(10, max_tracked_keys)
+        self._next_prune = time.monotonic() + prune_interval
+        self.admitted: Dict[str, int] = {}
+        self.rejected: Dict[str, int] = {}
+        self.rejected_by_key: Dict[str, int] = {}
+
+    def check(self, kind: str, limit: Optional[Limit], *keys: str) -> Optional[float]:
+        """Take a token for ``kind`` from every key. Returns None if admitted, else seconds to wait."""
+        if not limit or limit[0] <= 0:
+            self.admitted[kind] = self.admitted.get(kind, 0) + 1
+            return None
+        rate, burst = limit
+        now = time.monotonic()
+        if now >= self._next_prune:
+            self.prune(now)
+        buckets = []
+        for key in keys:
+            bucket = self._buckets.get((kind, key))
+            if bucket is None:
+                bucket = self._buckets[(kind, key)] = TokenBucket(rate, burst)
+            elif bucket.rate != rate or bucket.burst != max(1.0, burst):
+                # Gamemode changed the limit; keep the current level within the new burst
+                bucket.refill(now)
+                bucket.rate, bucket.burst = rate, max(1.0, burst)
+                bucket.tokens = min(bucket.tokens, bucket.burst)
+            bucket.refill(now)
+            buckets.append(bucket)
+
+        wait = max((bucket.retry_after() for bucket in buckets), default=0.0)
+        if wait > 0:
+            self.rejected[kind] = self.rejected.get(kind, 0) + 1
+            for key in keys:
+                self.rejected_by_key[key] = self.rejected_by_key.get(key, 0) + 1
+            if len(self.rejected_by_key) > 2 * self.max_tracked_keys:
+                top = sorted(self.rejected_by_key.items(), key=lambda entry: entry[1], reverse=True)
+                self.rejected_by_key = dict(top[:self.max_tracked_keys])
+            return wait
+        for bucket in buckets:
+            bucket.tokens -= 1
+        self.admitted[kind] = self.admitted.get(kind, 0) + 1
+        return None
+
+    def forget(self, key: str):
+        """Drop every bucket of a key, e.g. a sid that disconnected."""
+        for bucket_key in [bucket_key for bucket_key in self._buckets if bucket_key[1] == key]:
+            del self._buckets[bucket_key]
+        self.rejected_by_key.pop(key, None)
+
+    def prune(self, now: Optional[float] = None):
+        """Drop buckets that have refilled to their burst."""
+        now = time.monotonic() if now is None else now
+        self._next_prune = now + self.prune_interval
+        for bucket_key, bucket in list(self._buckets.items()):
+            bucket.refill(now)
+            if bucket.tokens >= bucket.burst:
+                del self._buckets[bucket_key]
+
+    def stats(self) -> Dict[str, Any]:
+        top = sorted(self.rejected_by_key.items(), key=lambda entry: entry[1], reverse=True)[:10]
+        return {
+            "buckets": len(self._buckets),
+            "admitted": dict(self.admitted),
+            "rejected": dict(self.rejected),
+            "top_rejected": [{"key": key, "rejected": count} for key, count in top],
+        }
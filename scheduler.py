@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+log = logging.getLogger('LLMWorkQueue')
+
+# Higher runs first
+PRIORITY_BACKGROUND = 0
+PRIORITY_IDLE = 1
+PRIORITY_NORMAL = 2
+PRIORITY_URGENT = 3
+
+
+class _Job:
+    __slots__ = ('owner', 'priority', 'factory', 'future', 'enqueued_at')
+
+    def __init__(self, owner: str, priority: int, factory: Callable[[], Awaitable[Any]], future: asyncio.Future):
+        self.owner = owner
+        self.priority = priority
+        self.factory = factory
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+
+class LLMWorkQueue:
+    """Runs LLM work with a global concurrency cap, strict priorities and
+    round-robin fairness between owners (player uuids) of the same priority:
+    the owner that was served least recently goes next."""
+
+    def __init__(self, max_concurrency: int = 8, wait_window: int = 200):
+        self.max_concurrency = max(1, max_concurrency)
+        # priority -> owner -> queued jobs
+        self._queues: Dict[int, Dict[str, Deque[_Job]]] = {}
+        self._last_served: Dict[str, int] = {}
+        self._serial = 0
+        self._running = 0
+        self._tasks = set()
+        self._waits: Deque[float] = deque(maxlen=wait_window)
+        self.completed = 0
+
+    @property
+    def depth(self) -> int:
+        return sum(len(jobs) for owners in self._queues.values() for jobs in owners.values())
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    def busy(self) -> bool:
+        """True when new work would have to wait for a slot."""
+        return self._running >= self.max_concurrency or self.depth > 0
+
+    async def run(self, owner: str, priority: int, factory: Callable[[], Awaitable[Any]]):
+        """Queue ``factory()`` and return its result once it got a slot and finished."""
+        future = asyncio.get_running_loop().create_future()
+        job = _Job(owner or '', priority, factory, future)
+        owners = self._queues.setdefault(priority, {})
+        owners.setdefault(job.owner, deque()).append(job)
+        self._dispatch()
+        return await future
+
+    def forget(self, owner: str):
+        """Drop the fairness record of an owner that left, unless it still has work queued."""
+        if not any(owner in owners for owners in self._queues.values()):
+            self._last_served.pop(owner, None)
+
+    def _next_job(self) -> Optional[_Job]:
+        for priority in sorted(self._queues, reverse=True):
+            owners = self._queues[priority]
+            while owners:
+                # Least recently served owner first; owners never served before go ahead of everyone
+                owner = min(owners, key=lambda candidate: self._last_served.get(candidate, -1))
+                jobs = owners[owner]
+                job = jobs.popleft()
+                if not jobs:
+                    del owners[owner]
+                if not job.future.cancelled():
+                    self._serial += 1
+                    self._last_served[owner] = self._serial
+                    return job
+            del self._queues[priority]
+        return None
+
+    def _dispatch(self):
+        while self._running < self.max_concurrency:
+            job = self._next_job()
+            if job is None:
+                return
+            self._running += 1
+            self._waits.append(time.monotonic() - job.enqueued_at)
+            task = asyncio.ensure_future(self._execute(job))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _execute(self, job: _Job):
+        try:
+            result = await job.factory()
+        except asyncio.CancelledError:
+            job.future.cancel()
+            raise
+        except Exception as exc:
+            if not job.future.done():
+                job.future.set_exception(exc)
+        else:
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            self._running -= 1
+            self.completed += 1
+            self._dispatch()
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self._waits)
+        by_priority = {
+            str(priority): sum(len(jobs) for jobs in owners.values())
+            for priority, owners in self._queues.items()
+        }
+        by_owner: Dict[str, int] = {}
+        for owners in self._queues.values():
+            for owner, jobs in owners.items():
+                by_owner[owner] = by_owner.get(owner, 0) + len(jobs)
+        return {
+            "max_concurrency": self.max_concurrency,
+            "running": self._running,
+            "depth": self.depth,
+            "depth_by_priority": by_priority,
+            "depth_by_owner": by_owner,
+            "completed": self.completed,
+            "wait_avg": sum(waits) / len(waits) if waits else None,
+            "wait_p95": waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else None,
+            "wait_max": waits[-1] if waits else None,
+        }
@@ -0,0 +1,257 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+from cache import Cache
+from combos import COMBO_SYSTEM_PROMPT, combo_user_prompt, store_combo_result
+from llm import LLMClient
+from persistence import write_json_atomic
+from sqlite_cache import SqliteCache
+
+DEFAULT_ITEMS = ["Water", "Fire", "Earth", "Air"]
+
+
+class Seeder:
+    """Breadth-first expansion of the discovery frontier.
+
+    Level ``L`` pairs every item first found at depth ``L`` with every known
+    item of depth ``<= L``. Pairs already in the cache are free; the rest go
+    to the LLM through the same prompt and validation as the live game, and
+    new results join the next level. Progress (known items, finished pairs and
+    spend counters) is checkpointed so an interrupted run picks up where it
+    stopped; pairs that failed upstream are not marked done and get retried.
+    """
+
+    def __init__(self, cache: Cache, llm: LLMClient, checkpoint: Optional[str], concurrency: int = 8,
+                 max_depth: int = 3, max_pairs: Optional[int] = None, max_tokens: Optional[int] = None,
+                 checkpoint_every: int = 50):
+        self.cache = cache
+        self.llm = llm
+        self.checkpoint = checkpoint
+        self.concurrency = max(1, concurrency)
+        self.max_depth = max_depth
+        self.max_pairs = max_pairs
+        self.max_tokens = max_tokens
+        self.checkpoint_every = max(1, checkpoint_every)
+        # casefolded name -> [canonical name, depth]
+        self.items: Dict[str, List[Any]] = {}
+        self.done = set()
+        self.level = 0
+        self.llm_pairs = 0
+        self.tokens = 0
+        self.failed = 0
+        self.new_items = 0
+        self._since_checkpoint = 0
+        self._tokens_base = 0
+        self.stopped = None
+
+    def add_item(self, name: str, depth: int) -> bool:
+        normalized = self.cache._normalize_name(name)
+        if not normalized or normalized in self.items:
+            return False
+        self.items[normalized] = [name, depth]
+        return True
+
+    def load_checkpoint(self) -> bool:
+        if not self.checkpoint or not os.path.exists(self.checkpoint):
+            return False
+        with open(self.checkpoint, "r", encoding="utf-8") as fh:
+            state = json.load(fh)
+        for name, depth in state.get("items", []):
+            self.add_item(name, depth)
+        self.done = set(state.get("done", []))
+        self.level = state.get("level", 0)
+        self.llm_pairs = state.get("llm_pairs", 0)
+        self.tokens = self._tokens_base = state.get("tokens", 0)
+        return True
+
+    def save_checkpoint(self):
+        self.cache.save()
+        self._since_checkpoint = 0
+        if not self.checkpoint:
+            return
+        write_json_atomic(self.checkpoint, {
+            "items": list(self.items.values()),
+            "done": sorted(self.done),
+            "level": self.level,
+            "llm_pairs": self.llm_pairs,
+            "tokens": self.tokens,
+        }, ensure_ascii=False)
+
+    def _limit_reached(self) -> Optional[str]:
+        if self.max_pairs is not None and self.llm_pairs >= self.max_pairs:
+            return "pair limit"
+        if self.max_tokens is not None and self.tokens >= self.max_tokens:
+            return "token limit"
+        return None
+
+    def _level_pairs(self, level: int) -> List[Tuple[str, str]]:
+        entries = list(self.items.values())
+        current = [name for name, depth in entries if depth == level]
+        known = [name for name, depth in entries if depth <= level]
+        pairs = []
+        seen = set()
+        for item1 in current:
+            for item2 in known:
+                key = self.cache._normalize_key(item1, item2)
+                if key in seen or key in self.done:
+                    continue
+                seen.add(key)
+                pairs.append((item1, item2))
+        return pairs
+
+    def _record(self, item1: str, item2: str, name: Optional[str]):
+        self.done.add(self.cache._normalize_key(item1, item2))
+        if isinstance(name, str) and self.add_item(name, self.level + 1):
+            self.new_items += 1
+        self._since_checkpoint += 1
+        if self._since_checkpoint >= self.checkpoint_every:
+            self.save_checkpoint()
+
+    async def _resolve(self, item1: str, item2: str):
+        cached = self.cache.get_combo(item1, item2)
+        if cached is not None:
+            self._record(item1, item2, cached.get("name"))
+            return
+
+        reason = self._limit_reached()
+        if reason:
+            self.stopped = reason
+            return
+        self.llm_pairs += 1
+        result = await self.llm.complete_json(COMBO_SYSTEM_PROMPT, combo_user_prompt(item1, item2))
+        self.tokens = self._tokens_base + self.llm.tokens_used
+        stored = store_combo_result(self.cache, item1, item2, result) if result is not None else None
+        if stored is None and self.cache.get_combo(item1, item2) is None:
+            # Upstream error or malformed answer; leave the pair open for the next run
+            self.failed += 1
+            return
+        self._record(item1, item2, stored.get("name") if stored else None)
+
+    async def _worker(self, queue: "asyncio.Queue[Tuple[str, str]]"):
+        while True:
+            try:
+                item1, item2 = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            if self.stopped:
+                continue
+            await self._resolve(item1, item2)
+
+    async def run(self):
+        while self.level < self.max_depth and not self.stopped:
+            pairs = self._level_pairs(self.level)
+            print(f"Level {self.level}: {len(pairs)} open pairs, {len(self.items)} known items")
+            queue: asyncio.Queue = asyncio.Queue()
+            for pair in pairs:
+                queue.put_nowait(pair)
+            await asyncio.gather(*(self._worker(queue) for _ in range(self.concurrency)))
+            if self.stopped or self.failed:
+                # Failed pairs must be retried before their level counts as finished
+                break
+            self.level += 1
+            self.save_checkpoint()
+        self.save_checkpoint()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Pre-seed the combo cache by expanding the discovery frontier breadth-first with the LLM.",
+    )
+    parser.add_argument(
+        "--items",
+        nargs="+",
+        default=DEFAULT_ITEMS,
+        help="Starting items (default: %(default)s)",
+    )
+    parser.add_argument("--combo-cache", default="cache/combocache.json", help="Combo cache JSON to extend")
+    parser.add_argument("--item-cache", default="cache/itemcache.json", help="Item cache JSON to extend")
+    parser.add_argument(
+        "--db",
+        default=None,
+        help="Seed the SQLite cache database at this path instead of the JSON files",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        default="cache/seed_checkpoint.json",
+        help="Progress file used to resume an interrupted run (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--checkpoint-every",
+        type=int,
+        default=50,
+        help="Write the caches and the checkpoint after this many finished pairs",
+    )
+    parser.add_argument("--max-depth", type=int, default=3, help="Number of breadth-first levels to expand")
+    parser.add_argument("--max-pairs", type=int, default=None, help="Stop after this many LLM lookups in total")
+    parser.add_argument(
+        "--max-tokens",
+        type=int,
+        default=None,
+        help="Stop once the upstream reported this many tokens in total",
+    )
+    parser.add_argument("--concurrency", type=int, default=8, help="Simultaneous LLM requests")
+    parser.add_argument("--verbose", action="store_true", help="Log every LLM request")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format='%(asctime)s %(levelname)s [%(name)s] %(message)s',
+    )
+    if not os.getenv("LLM_KEY") and not os.getenv("LLM_ENDPOINTS"):
+        print("LLM_KEY or LLM_ENDPOINTS must be set", file=sys.stderr)
+        sys.exit(1)
+
+    if args.db:
+        cache = SqliteCache(args.db, args.combo_cache, args.item_cache)
+    else:
+        cache = Cache(args.combo_cache, args.item_cache)
+    cache.load()
+
+    seeder = Seeder(
+        cache,
+        LLMClient.from_env(),
+        args.checkpoint,
+        concurrency=args.concurrency,
+        max_depth=args.max_depth,
+        max_pairs=args.max_pairs,
+        max_tokens=args.max_tokens,
+        checkpoint_every=args.checkpoint_every,
+    )
+    if seeder.load_checkpoint():
+        print(f"Resuming from {args.checkpoint} at level {seeder.level} with {len(seeder.done)} finished pairs")
+    for name in args.items:
+        seeder.add_item(cache.find_existing_name(name) or name, 0)
+
+    async def _run():
+        try:
+            await seeder.run()
+        finally:
+            await seeder.llm.aclose()
+
+    try:
+        asyncio.run(_run())
+    except KeyboardInterrupt:
+        seeder.save_checkpoint()
+        print("Interrupted, progress saved", file=sys.stderr)
+    finally:
+        cache.close()
+
+    if seeder.stopped:
+        status = f"stopped at {seeder.stopped}"
+    elif seeder.failed:
+        status = f"{seeder.failed} pairs failed and will be retried on the next run"
+    else:
+        status = f"reached depth {seeder.level}"
+    print(
+        f"Done ({status}). {seeder.llm_pairs} LLM lookups, {seeder.tokens} tokens, "
+        f"{seeder.new_items} new items, {len(seeder.items)} known items, {len(seeder.done)} finished pairs.",
+    )
+
+
+if __name__ == "__main__":
+    main()
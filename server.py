@@ -1,3 +1,6 @@
+import asyncio
+import importlib.util
+import json
 import logging
 import os
 from typing import Any, Dict
@@ -6,19 +9,47 @@ import socketio
 from aiohttp import web
 
 from game import GameController
-from templates import error
+from poolsync import parse_known_items
+from ratelimit import EVENT_BINGO_CLICK, EVENT_ITEMS_RESYNC, EVENT_PAIR_HIT, EVENT_PAIR_MISS, RateLimiter
+from templates import error, rate_limited
 
 log = logging.getLogger('webserver')
 
 NAMESPACE = '/game'
 
 
+def _env_flag(name: str, default: bool = False) -> bool:
+    raw = os.getenv(name)
+    if raw is None or not raw.strip():
+        return default
+    return raw.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def socketio_options() -> Dict[str, Any]:
+    """Serializer and transport settings shared by the server and the browser client."""
+    serializer = os.getenv('SOCKETIO_SERIALIZER', 'json').strip().lower()
+    if serializer == 'msgpack' and importlib.util.find_spec('msgpack') is None:
+        log.warning('SOCKETIO_SERIALIZER=msgpack requested but the msgpack package is not installed, using JSON')
+        serializer = 'json'
+    elif serializer not in ('json', 'msgpack'):
+        log.warning('Unknown SOCKETIO_SERIALIZER %r, using JSON', serializer)
+        serializer = 'json'
+    return {
+        'serializer': serializer,
+        'transports': ['websocket'] if _env_flag('SOCKETIO_WEBSOCKET_ONLY') else ['polling', 'websocket'],
+        # Applies to long-polling responses; websocket frames rely on permessage-deflate negotiation
+        'http_compression': _env_flag('SOCKETIO_HTTP_COMPRESSION', True),
+        'compression_threshold': int(os.getenv('SOCKETIO_COMPRESSION_THRESHOLD', '1024')),
+    }
+
+
 class GameNamespace(socketio.AsyncNamespace):
     def __init__(self, controller: GameController):
         super().__init__(NAMESPACE)
         self.controller = controller
         self.sid_user = {}
         self.sid_name = {}
+        self.limiter = RateLimiter()
 
     async def on_connect(self, sid: str, environ: Dict[str, Any]):
         user_id, display_name = self._extract_identity(environ)
@@ -46,7 +77,8 @@ class GameNamespace(socketio.AsyncNamespace):
         if not name:
             name = 'Unbekannt'
 
-        await self.controller.handle_client_join(sid, uuid, name)
+        await self.controller.handle_client_join(
+            sid, uuid, name, parse_known_items(data.get('items')), compact=data.get('ids') is True)
 
     async def on_pair(self, sid: str, data: Dict[str, Any]):
         uuid = self.controller.sid_to_uuid.get(sid)
@@ -63,6 +95,16 @@ class GameNamespace(socketio.AsyncNamespace):
         pair = data.get('pair')
         if not isinstance(pair, list) or len(pair) != 2:
             return await self.emit('server_message', error('Pair must contain two items'), to=sid, namespace=self.namespace)
+        # Compact clients reference items by id
+        pair = [self.controller.item_ids.name_for(entry) if isinstance(entry, int) else entry for entry in pair]
+        if not all(isinstance(entry, str) for entry in pair):
+            return await self.emit('server_message', error('Unknown item in pair'), to=sid, namespace=self.namespace)
+
+        kind = EVENT_PAIR_HIT if self.controller.is_cheap_pair(pair[0], pair[1]) else EVENT_PAIR_MISS
+        retry_after = self._admit(sid, uuid, kind)
+        if retry_after is not None:
+            return await self.emit('server_message', rate_limited(kind, retry_after, pair_id), to=sid,
+                                   namespace=self.namespace)
 
         await self.controller.handle_client_pair(uuid, pair_id, pair[0], pair[1])
 
@@ -82,6 +124,11 @@ class GameNamespace(socketio.AsyncNamespace):
         if not all(isinstance(val, int) for val in (index, row, col, size)):
             return await self.emit('server_message', error('Invalid bingo coordinates'), to=sid, namespace=self.namespace)
 
+        retry_after = self._admit(sid, uuid, EVENT_BINGO_CLICK)
+        if retry_after is not None:
+            return await self.emit('server_message', rate_limited(EVENT_BINGO_CLICK, retry_after), to=sid,
+                                   namespace=self.namespace)
+
         click_data = {
             'index': index,
             'row': row,
@@ -94,6 +141,18 @@ class GameNamespace(socketio.AsyncNamespace):
 
         await self.controller.handle_client_bingo_click(uuid, click_data)
 
+    async def on_items_resync(self, sid: str, data: Dict[str, Any] = None):
+        uuid = self.controller.sid_to_uuid.get(sid)
+        if not uuid:
+            return await self.emit('server_message', error('Not joined'), to=sid, namespace=self.namespace)
+
+        retry_after = self._admit(sid, uuid, EVENT_ITEMS_RESYNC)
+        if retry_after is not None:
+            return await self.emit('server_message', rate_limited(EVENT_ITEMS_RESYNC, retry_after), to=sid,
+                                   namespace=self.namespace)
+
+        await self.controller.handle_client_items_resync(uuid)
+
     async def on_username(self, sid: str, data: Dict[str, Any]):
         # Usernames are managed by OAuth2; ignore client-side rename attempts
         return await self.emit('server_message', error('Username managed by SSO'), to=sid, namespace=self.namespace)
@@ -102,8 +161,21 @@ class GameNamespace(socketio.AsyncNamespace):
         await self.controller.handle_disconnect(sid)
         self.sid_user.pop(sid, None)
         self.sid_name.pop(sid, None)
+        self.limiter.forget(f'sid:{sid}')
         log.info('Client disconnected: %s', sid)
 
+    def _admit(self, sid: str, uuid: str, kind: str):
+        """None if the event may proceed, else the seconds until the sid and uuid budgets allow it."""
+        limit = self.controller.gamemode.rate_limit(kind)
+        return self.limiter.check(kind, limit, f'sid:{sid}', f'uuid:{uuid}')
+
+    def rate_limit_stats(self) -> Dict[str, Any]:
+        return {
+            'gamemode': self.controller.get_gamemode_name(),
+            'limits': self.controller.gamemode.rate_limits(),
+            **self.limiter.stats(),
+        }
+
     def _extract_identity(self, environ: Dict[str, Any]):
         request = environ.get('aiohttp.request')
         if not request:
@@ -146,18 +218,29 @@ class GameNamespace(socketio.AsyncNamespace):
 
 class GameServer:
     def __init__(self):
+        self.socket_options = socketio_options()
+        log.info('Socket.IO options: %s', self.socket_options)
         self.socket_server = socketio.AsyncServer(
             async_mode='aiohttp',
             cors_allowed_origins='*',
             logger=True,
             engineio_logger=logging.getLogger('engineio.server'),
+            serializer='msgpack' if self.socket_options['serializer'] == 'msgpack' else 'default',
+            transports=self.socket_options['transports'],
+            http_compression=self.socket_options['http_compression'],
+            compression_threshold=self.socket_options['compression_threshold'],
         )
         self.app = web.Application()
         self.socket_server.attach(self.app)
         self.controller = GameController(self.socket_server, namespace=NAMESPACE)
-        self.socket_server.register_namespace(GameNamespace(self.controller))
+        self.game_namespace = GameNamespace(self.controller)
+        self.socket_server.register_namespace(self.game_namespace)
         self._setup_static_routes()
         self._setup_admin_routes()
+        self.app.on_cleanup.append(self._on_cleanup)
+
+    async def _on_cleanup(self, _: web.Application):
+        await self.controller.close()
 
     def _setup_static_routes(self):
         # Serve frontend assets from the ui folder at the project root
@@ -170,7 +253,15 @@ class GameServer:
         async def index_handler(_: web.Request):
             return web.FileResponse(os.path.join(static_dir, 'index.html'))
 
+        # The client must pick the matching Socket.IO bundle before it connects
+        client_config = {'serializer': self.socket_options['serializer']}
+
+        async def socket_config_handler(_: web.Request):
+            body = f"window.socketConfig = {json.dumps(client_config)};\n"
+            return web.Response(text=body, content_type='application/javascript', headers={'Cache-Control': 'no-cache'})
+
         self.app.router.add_get('/', index_handler)
+        self.app.router.add_get('/socket-config.js', socket_config_handler)
         # Static files (JS/CSS/assets) served from root paths
         self.app.router.add_static('/', static_dir, show_index=False)
 
@@ -252,13 +343,52 @@ class GameServer:
                 return unauthorized
 
             try:
-                self.controller.save_cache()
+                saved = await asyncio.to_thread(self.controller.save_cache)
             except Exception:
                 log.exception('Failed to save cache on demand')
+                saved = False
+            if not saved:
                 return web.json_response({'error': 'failed to save cache'}, status=500)
 
             return web.json_response({'status': 'ok'})
 
+        async def admin_emoji_backfill(request: web.Request):
+            unauthorized = await _require_admin(request)
+            if unauthorized:
+                return unauthorized
+
+            if request.method == 'GET':
+                return web.json_response(self.controller.emoji_backfill_stats)
+
+            try:
+                body = await request.json() if request.can_read_body else {}
+            except Exception:
+                return web.json_response({'error': 'invalid json body'}, status=400)
+            try:
+                batch_size = int(body.get('batch_size', 25))
+                concurrency = int(body.get('concurrency', 4))
+                limit = int(body['limit']) if body.get('limit') is not None else None
+            except (TypeError, ValueError):
+                return web.json_response({'error': 'batch_size, concurrency and limit must be integers'}, status=400)
+
+            if not self.controller.start_emoji_backfill(batch_size, concurrency, limit):
+                return web.json_response({'error': 'emoji backfill already running'}, status=409)
+            return web.json_response(self.controller.emoji_backfill_stats, status=202)
+
+        async def admin_ratelimits(request: web.Request):
+            unauthorized = await _require_admin(request)
+            if unauthorized:
+                return unauthorized
+
+            return web.json_response(self.game_namespace.rate_limit_stats())
+
+        async def admin_llm(request: web.Request):
+            unauthorized = await _require_admin(request)
+            if unauthorized:
+                return unauthorized
+
+            return web.json_response(self.controller.get_llm_stats())
+
         async def admin_finish_gamemode(request: web.Request):
             unauthorized = await _require_admin(request)
             if unauthorized:
@@ -302,7 +432,10 @@ class GameServer:
         self.app.router.add_post('/admin/gamemode', admin_gamemode)
         self.app.router.add_post('/admin/broadcast', admin_broadcast)
         self.app.router.add_post('/admin/cache/save', admin_save_cache)
+        self.app.router.add_route('*', '/admin/cache/backfill-emoji', admin_emoji_backfill)
         self.app.router.add_post('/admin/gamemode/finish', admin_finish_gamemode)
+        self.app.router.add_get('/admin/llm', admin_llm)
+        self.app.router.add_get('/admin/ratelimits', admin_ratelimits)
         self.app.router.add_route('*', '/admin/stopwatch', admin_stopwatch)
 
     def run(self):
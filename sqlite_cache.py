@@ -0,0 +1,233 @@
+import logging
+import os
+import sqlite3
+from collections import OrderedDict
+from typing import Optional
+
+from cache import Cache
+
+log = logging.getLogger('SqliteCache')
+
+_MISSING = object()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS combos (
+    key TEXT PRIMARY KEY,
+    result TEXT,
+    result_norm TEXT
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS combos_result_norm ON combos(result_norm);
+CREATE TABLE IF NOT EXISTS items (
+    name TEXT PRIMARY KEY,
+    emoji TEXT,
+    name_norm TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS items_name_norm ON items(name_norm);
+"""
+
+
+class _LRU:
+    def __init__(self, capacity: int):
+        self.capacity = max(0, capacity)
+        self._data = OrderedDict()
+
+    def get(self, key):
+        value = self._data.get(key, _MISSING)
+        if value is not _MISSING:
+            self._data.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        if not self.capacity:
+            return
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.capacity:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SqliteCache(Cache):
+    """Cache backend that keeps combos and items in SQLite with a bounded LRU in front.
+
+    Same public API as the JSON ``Cache``, but nothing is held in memory
+    beyond the hot tier. Rows are written as they are added, so ``save()``
+    only has to commit. On first start with an empty database the JSON cache
+    files are imported once.
+    """
+
+    def __init__(self, db_file: str = 'cache/cache.sqlite3', combo_file: Optional[str] = 'cache/combocache.json',
+                 item_file: Optional[str] = 'cache/itemcache.json', hot_size: int = 50000):
+        self.db_file = db_file
+        self.combo_file = combo_file
+        self.item_file = item_file
+        self.persistence = None
+        self.conn: Optional[sqlite3.Connection] = None
+        self._hot_combos = _LRU(hot_size)
+        self._hot_items = _LRU(hot_size)
+
+    def attach_persistence(self, persistence):
+        # Rows are written immediately; there is nothing to schedule.
+        self.persistence = persistence
+
+    def _connect(self):
+        if self.conn is not None:
+            return self.conn
+        os.makedirs(os.path.dirname(self.db_file) or '.', exist_ok=True)
+        conn = sqlite3.connect(self.db_file, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(SCHEMA)
+        self.conn = conn
+        return conn
+
+    def load(self, combo_file: Optional[str] = None, item_file: Optional[str] = None):
+        conn = self._connect()
+        self._hot_combos.clear()
+        self._hot_items.clear()
+        has_rows = conn.execute('SELECT EXISTS(SELECT 1 FROM combos) OR EXISTS(SELECT 1 FROM items)').fetchone()[0]
+        if has_rows:
+            log.info('Opened cache database %s', self.db_file)
+            return
+        combos = self._load_mapping(combo_file or self.combo_file)
+        items = self._load_mapping(item_file or self.item_file)
+        if combos or items:
+            self.import_mappings(combos, items)
+
+    def import_mappings(self, combos: dict, items: dict):
+        """Bulk-insert JSON cache mappings in one transaction."""
+        conn = self._connect()
+        combo_rows = []
+        for key, value in combos.items():
+            result = None if self._is_none_value(value) else value
+            combo_rows.append((key, result, self._normalize_name(result)))
+        item_rows = []
+        for name, emoji in items.items():
+            normalized = self._normalize_name(name)
+            if not normalized or self._is_none_value(name):
+                continue
+            if isinstance(emoji, list):
+                emoji = emoji[0] if emoji else None
+            item_rows.append((name, emoji, normalized))
+        conn.execute('BEGIN')
+        try:
+            conn.executemany('INSERT OR REPLACE INTO combos (key, result, result_norm) VALUES (?, ?, ?)', combo_rows)
+            conn.executemany('INSERT OR IGNORE INTO items (name, emoji, name_norm) VALUES (?, ?, ?)', item_rows)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        log.info('Imported %d combos and %d items into %s', len(combo_rows), len(item_rows), self.db_file)
+
+    def save(self, combo_file: Optional[str] = None, item_file: Optional[str] = None):
+        # Every write is committed as it happens; just make sure nothing is left open.
+        if self.conn is not None and self.conn.in_transaction:
+            self.conn.execute('COMMIT')
+
+    def close(self):
+        if self.conn is not None:
+            self.save()
+            self.conn.close()
+            self.conn = None
+
+    def find_existing_name(self, name: Optional[str]) -> Optional[str]:
+        target = self._normalize_name(name)
+        if not target:
+            return None
+        conn = self._connect()
+        row = conn.execute('SELECT name FROM items WHERE name_norm = ? ORDER BY rowid LIMIT 1', (target,)).fetchone()
+        if row is None:
+            row = conn.execute('SELECT result FROM combos WHERE result_norm = ? LIMIT 1', (target,)).fetchone()
+        return row[0] if row else None
+
+    def item_names(self):
+        return [row[0] for row in self._connect().execute('SELECT name FROM items ORDER BY rowid')]
+
+    def item_emojis(self):
+        rows = self._connect().execute('SELECT name, emoji FROM items ORDER BY rowid')
+        return [(name, emoji if isinstance(emoji, str) and emoji.strip() else None) for name, emoji in rows]
+
+    def _item_row_emoji(self, name: str):
+        emoji = self._hot_items.get(name)
+        if emoji is _MISSING:
+            row = self._connect().execute('SELECT emoji FROM items WHERE name = ?', (name,)).fetchone()
+            if row is None:
+                return _MISSING
+            emoji = row[0]
+            self._hot_items.put(name, emoji)
+        return emoji
+
+    def get_item_emoji(self, name: str):
+        emoji = self._item_row_emoji(name) if isinstance(name, str) else _MISSING
+        if emoji is _MISSING:
+            return None
+        if isinstance(emoji, str) and not emoji.strip():
+            return None
+        return emoji
+
+    def get_combo(self, item1: str, item2: str):
+        key = self._normalize_key(item1, item2)
+        result = self._hot_combos.get(key)
+        if result is _MISSING:
+            row = self._connect().execute('SELECT result FROM combos WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            result = row[0]
+            self._hot_combos.put(key, result)
+        if self._is_none_value(result):
+            return {"name": None, "emoji": None}
+        return {"name": result, "emoji": self.get_item_emoji(result)}
+
+    def add_combo(self, item1: str, item2: str, result_name: Optional[str], result_emoji: Optional[str]):
+        key = self._normalize_key(item1, item2)
+        if self._is_none_value(result_name):
+            result_name = None
+        else:
+            result_name = self.find_existing_name(result_name) or result_name
+        self._connect().execute(
+            'INSERT OR REPLACE INTO combos (key, result, result_norm) VALUES (?, ?, ?)',
+            (key, result_name, self._normalize_name(result_name)),
+        )
+        self._hot_combos.put(key, result_name)
+        if result_emoji is not None and result_name is not None:
+            self.set_item_emoji(result_name, result_emoji)
+
+    def set_item_emoji(self, name: str, emoji: str):
+        if self._is_none_value(name) or emoji is None or (isinstance(emoji, str) and not emoji.strip()):
+            return
+        if self._item_row_emoji(name) == emoji:
+            return
+        self._connect().execute(
+            'INSERT INTO items (name, emoji, name_norm) VALUES (?, ?, ?) '
+            'ON CONFLICT(name) DO UPDATE SET emoji = excluded.emoji',
+            (name, emoji, self._normalize_name(name)),
+        )
+        self._hot_items.put(name, emoji)
+
+    def set_item_emojis(self, emojis: dict):
+        rows = [
+            (name, emoji, self._normalize_name(name))
+            for name, emoji in emojis.items()
+            if not self._is_none_value(name) and isinstance(emoji, str) and emoji.strip()
+        ]
+        if not rows:
+            return
+        conn = self._connect()
+        conn.execute('BEGIN')
+        try:
+            conn.executemany(
+                'INSERT INTO items (name, emoji, name_norm) VALUES (?, ?, ?) '
+                'ON CONFLICT(name) DO UPDATE SET emoji = excluded.emoji',
+                rows,
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        for name, emoji, _ in rows:
+            self._hot_items.put(name, emoji)
@@ -12,6 +12,14 @@ def pair_empty_result(pair_id):
     return {'type': 'pair_result', 'data': {"id": pair_id, "new_item": None}}
 
 
+def pair_pending(pair_id, request_id, deadline=None):
+    return {'type': 'pair_pending', 'data': {"id": pair_id, "request_id": request_id, "deadline": deadline}}
+
+
+def pair_timeout(pair_id, request_id):
+    return {'type': 'pair_timeout', 'data': {"id": pair_id, "request_id": request_id}}
+
+
 def news(message):
     return {'type': 'news', 'data': message}
 
@@ -28,18 +36,55 @@ def users(user_list):
     return {'type': 'users', 'data': user_list}
 
 
+def users_join(entries):
+    return {'type': 'users_join', 'data': entries}
+
+
+def users_leave(uuids):
+    return {'type': 'users_leave', 'data': uuids}
+
+
 def timer(seconds):
     return {'type': 'timer', 'data': seconds}
 
 
-def item_list(items):
-    return {'type': 'items', 'data': items}
+def stopwatch(state):
+    return {'type': 'stopwatch', 'data': state}
+
+
+def state(parts):
+    """Several messages the client applies together, in order."""
+    return {'type': 'state', 'data': parts}
+
+
+def item_list(items, version=None, pool_hash=None):
+    return {'type': 'items', 'data': items, 'version': version, 'hash': pool_hash}
+
+
+def items_add(new_items, base_version, version, pool_hash=None):
+    return {'type': 'items_add', 'data': {"from": base_version, "version": version, "hash": pool_hash, "items": new_items}}
+
+
+def items_up_to_date(version, pool_hash):
+    return {'type': 'items_up_to_date', 'data': {"version": version, "hash": pool_hash}}
+
+
+def item_update(name, emoji):
+    return {'type': 'item_update', 'data': {'name': name, 'emoji': emoji}}
 
 
 def bingo(field):
     return {'type': 'bingo', 'data': field}
 
 
+def bingo_cell(index, cell):
+    return {'type': 'bingo_cell', 'data': {"index": index, **cell}}
+
+
+def identity(uuid):
+    return {'type': 'identity', 'data': uuid}
+
+
 def hide_bingo():
     return {'type': 'hide_bingo'}
 
@@ -52,6 +97,10 @@ def error(message):
     return {'type': 'error', 'data': message}
 
 
+def rate_limited(event, retry_after, pair_id=None):
+    return {'type': 'rate_limited', 'data': {"event": event, "retry_after": round(retry_after, 2), "id": pair_id}}
+
+
 def retry():
     return {'type': 'retry'}
 
@@ -0,0 +1,129 @@
+import asyncio
+import json
+import time
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from llm import CircuitBreaker, LLMClient, LLMEndpoint
+
+
+class StubEndpoint:
+    """Local chat completion server answering with a fixed status, after an optional delay."""
+
+    def __init__(self, answer=None, status=200, delay=0.0):
+        self.answer = answer or {"name": "Steam", "emoji": "💨"}
+        self.status = status
+        self.delay = delay
+        self.requests = 0
+        app = web.Application()
+        app.router.add_post('/v1/chat/completions', self._handle)
+        self.server = TestServer(app)
+
+    async def _handle(self, request):
+        self.requests += 1
+        await request.json()
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.status != 200:
+            return web.json_response({"error": "unavailable"}, status=self.status)
+        return web.json_response({
+            "choices": [{"message": {"content": json.dumps(self.answer)}}],
+            "usage": {"total_tokens": 10},
+        })
+
+    async def __aenter__(self):
+        await self.server.start_server()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.server.close()
+
+    def endpoint(self, breaker=None):
+        return LLMEndpoint(str(self.server.make_url('/v1/chat/completions')), 'stub', 'test-key', breaker=breaker)
+
+
+def _client(endpoints, **kwargs):
+    kwargs.setdefault('max_retries', 0)
+    return LLMClient(endpoints, **kwargs)
+
+
+def test_routes_to_healthy_endpoint_after_failure():
+    async def scenario():
+        async with StubEndpoint(status=503) as broken, StubEndpoint() as healthy:
+            client = _client([broken.endpoint(), healthy.endpoint()])
+            try:
+                first = await client.complete_json('system', 'user')
+                second = await client.complete_json('system', 'user')
+            finally:
+                await client.aclose()
+            return first, second, broken.requests, healthy.requests, client.tokens_used
+
+    first, second, broken_requests, healthy_requests, tokens = asyncio.run(scenario())
+    assert first is None
+    assert second == {"name": "Steam", "emoji": "💨"}
+    assert (broken_requests, healthy_requests) == (1, 1)
+    assert tokens == 10
+
+
+def test_breaker_opens_then_probes_and_closes():
+    async def scenario():
+        async with StubEndpoint(status=500) as stub:
+            endpoint = stub.endpoint(CircuitBreaker(failure_threshold=2, cooldown=0.2))
+            client = _client([endpoint])
+            try:
+                for _ in range(2):
+                    assert await client.complete_json('system', 'user') is None
+                opened = endpoint.breaker.state
+                # Open circuit: fail fast without reaching the server
+                assert await client.complete_json('system', 'user') is None
+                requests_while_open = stub.requests
+
+                await asyncio.sleep(0.25)
+                half_open = endpoint.breaker.state
+                stub.status = 200
+                probe = await client.complete_json('system', 'user')
+                return opened, requests_while_open, half_open, probe, endpoint.breaker.state
+            finally:
+                await client.aclose()
+
+    opened, requests_while_open, half_open, probe, closed = asyncio.run(scenario())
+    assert opened == 'open'
+    assert requests_while_open == 2
+    assert half_open == 'half_open'
+    assert probe == {"name": "Steam", "emoji": "💨"}
+    assert closed == 'closed'
+
+
+def test_failed_probe_reopens_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0.05)
+    breaker.record(False)
+    assert breaker.state == 'open'
+    time.sleep(0.06)
+    assert breaker.acquire()
+    assert not breaker.acquire()  # a single probe at a time
+    breaker.record(False)
+    assert breaker.state == 'open'
+    assert breaker.times_opened == 2
+
+
+def test_hedged_request_uses_faster_endpoint():
+    async def scenario():
+        async with StubEndpoint(delay=2.0) as slow, StubEndpoint(answer={"name": "Mud", "emoji": "🟤"}) as fast:
+            slow_endpoint = slow.endpoint()
+            client = _client([slow_endpoint, fast.endpoint()], hedge=True,
+                             hedge_default_delay=0.1, hedge_min_delay=0.05)
+            try:
+                started = time.monotonic()
+                result = await client.complete_json('system', 'user')
+                elapsed = time.monotonic() - started
+            finally:
+                await client.aclose()
+            return result, elapsed, client.hedges_sent, client.hedges_won, slow_endpoint.breaker.state
+
+    result, elapsed, sent, won, slow_breaker = asyncio.run(scenario())
+    assert result == {"name": "Mud", "emoji": "🟤"}
+    assert elapsed < 1.0
+    assert (sent, won) == (1, 1)
+    # The abandoned request is not counted as a failure
+    assert slow_breaker == 'closed'
@@ -85,8 +85,30 @@ function createItemChip(text_emoji,text_name){
     return chip;
 }
 
+function setChipEmoji(chip,text_emoji){
+    if(chip.emoji === text_emoji){
+        return;
+    }
+    chip.emoji = text_emoji;
+    chip.dataset.searchText = `${chip.name} ${text_emoji}`.toLowerCase();
+    chip.firstChild.innerText = text_emoji;
+}
+
+function updateItemEmoji(text_name,text_emoji){
+    if(text_name in item_buttons){
+        setChipEmoji(item_buttons[text_name], text_emoji);
+    }
+    items.forEach(function(item){
+        if(item.name === text_name){
+            setChipEmoji(item, text_emoji);
+        }
+    })
+    applyItemFilter();
+}
+
 function createItemButton(text_emoji,text_name){
     if(text_name in item_buttons){
+        setChipEmoji(item_buttons[text_name], text_emoji);
         return;
     }
     list = document.getElementById('item-list')
@@ -114,7 +136,7 @@ function createItemButton(text_emoji,text_name){
             const jitter = 100;
             const centerX = rect.left + rect.width / 2 + (Math.random() - 0.5) * jitter;
             const centerY = rect.top + rect.height / 2 + (Math.random() - 0.5) * jitter;
-            createItem(text_emoji, text_name, centerX, centerY, undefined, true);
+            createItem(itemButton.emoji, text_name, centerX, centerY, undefined, true);
         }
 
         function spawnForDrag(e){
@@ -122,7 +144,7 @@ function createItemButton(text_emoji,text_name){
             const spawnX = rect.left + rect.width / 2;
             const spawnY = rect.top + rect.height / 2;
             spawnedForDrag = true;
-            createItem(text_emoji, text_name, spawnX, spawnY, e, true);
+            createItem(itemButton.emoji, text_name, spawnX, spawnY, e, true);
         }
 
         function handleMove(e){
@@ -1,7 +1,163 @@
 waiting_pairs = {};
-last_pair_id = 1;
+// Results can arrive after a reconnect, so ids must not repeat across page loads
+last_pair_id = Date.now();
+// Version of the item list we hold; deltas only apply on top of the version they were made for
+items_version = null;
+items_hash = null;
+items_resync_pending = false;
+items_resync_timer = null;
+// Our copy of the pool, kept in IndexedDB so a reconnect only needs what changed
+known_items = [];
+// Compact protocol: ids the server assigned during this session
+item_dict = {};
+item_ids = {};
+// Players as of the last full list plus the deltas since
+user_list = [];
+// Our player id, to tell our own bingo cells from the shared board's owners
+my_uuid = null;
+bingo_field = null;
+let items_restored = null;
+let items_store_timer = null;
 let socket = null;
 
+const ITEM_DB_NAME = 'item-pool';
+const ITEM_DB_STORE = 'pools';
+const ITEMS_RESYNC_TIMEOUT_MS = 10000;
+
+function openItemDb(){
+    return new Promise((resolve) => {
+        if(!window.indexedDB){
+            resolve(null);
+            return;
+        }
+        const request = indexedDB.open(ITEM_DB_NAME, 1);
+        request.onupgradeneeded = () => request.result.createObjectStore(ITEM_DB_STORE);
+        request.onsuccess = () => resolve(request.result);
+        request.onerror = () => resolve(null);
+    });
+}
+
+async function restoreItems(){
+    const db = await openItemDb();
+    if(db === null){
+        return;
+    }
+    const record = await new Promise((resolve) => {
+        const request = db.transaction(ITEM_DB_STORE).objectStore(ITEM_DB_STORE).get(getServerUrl());
+        request.onsuccess = () => resolve(request.result);
+        request.onerror = () => resolve(undefined);
+    });
+    db.close();
+    if(!record || !Array.isArray(record.items) || items_version !== null){
+        return;
+    }
+    known_items = record.items;
+    replaceItemButtons(known_items);
+    items_version = record.version;
+    items_hash = record.hash;
+}
+
+function storeItems(){
+    // Coalesce bursts of deltas into one write
+    clearTimeout(items_store_timer);
+    items_store_timer = setTimeout(async () => {
+        const db = await openItemDb();
+        if(db === null){
+            return;
+        }
+        const record = {version: items_version, hash: items_hash, items: known_items};
+        db.transaction(ITEM_DB_STORE, 'readwrite').objectStore(ITEM_DB_STORE).put(record, getServerUrl());
+        db.close();
+    }, 1000);
+}
+
+function joinPayload(){
+    const payload = {ids: true};
+    if(items_version !== null && items_hash){
+        payload.items = {version: items_version, hash: items_hash};
+    }
+    return payload;
+}
+
+function itemFromId(id){
+    const entry = item_dict[id];
+    return entry ? {name: entry.name, emoji: entry.emoji} : {name: undefined, emoji: undefined};
+}
+
+function expandCompact(data){
+    // Learn new dictionary entries, then turn id references back into items
+    if(Array.isArray(data.dict)){
+        for(const [id, name, emoji] of data.dict){
+            item_dict[id] = {name, emoji};
+            item_ids[name] = id;
+        }
+    }
+    if(data.data === undefined || data.data === null){
+        return data;
+    }
+    switch(data.type){
+        case "items":
+            if(Array.isArray(data.data)){
+                data.data = data.data.map(entry => typeof entry === 'number' ? itemFromId(entry) : entry);
+            }
+            break;
+        case "items_add":
+            if(Array.isArray(data.data.items)){
+                data.data.items = data.data.items.map(entry => typeof entry === 'number' ? itemFromId(entry) : entry);
+            }
+            break;
+        case "pair_result":
+            if(typeof data.data.new_item === 'number'){
+                data.data.new_item = itemFromId(data.data.new_item);
+            }
+            break;
+        case "state":
+            if(Array.isArray(data.data)){
+                data.data = data.data.map(expandCompact);
+            }
+            break;
+        case "bingo":
+            if(Array.isArray(data.data.cells)){
+                for(const cell of data.data.cells){
+                    if(typeof cell.id === 'number'){
+                        cell.text = itemFromId(cell.id).name;
+                    }
+                }
+            }
+            break;
+    }
+    return data;
+}
+
+function requestItemsResync(delay_seconds){
+    // Pending until a full list arrives; a retry also covers a request that got no answer
+    items_resync_pending = true;
+    clearTimeout(items_resync_timer);
+    items_resync_timer = setTimeout(() => {
+        items_resync_timer = null;
+        if(!items_resync_pending){
+            return;
+        }
+        socket?.emit('items_resync', {});
+        items_resync_timer = setTimeout(() => {
+            items_resync_timer = null;
+            if(items_resync_pending){
+                console.log("no answer to item resync, asking again");
+                requestItemsResync(0);
+            }
+        }, ITEMS_RESYNC_TIMEOUT_MS);
+    }, delay_seconds * 1000);
+}
+
+function renderBingoField(){
+    // The board is shared by all players, so whether a cell is ours is worked out here
+    const cells = (bingo_field?.cells || []).map(cell => ({
+        ...cell,
+        done: cell.done || cell.free === true || (Array.isArray(cell.owners) && cell.owners.includes(my_uuid)),
+    }));
+    setBingoField(bingo_field ? {...bingo_field, cells} : bingo_field);
+}
+
 function handleBingoClick(payload){
     if(socket && socket.connected){
         socket.emit('bingo_click', payload);
@@ -20,13 +176,47 @@ function getServerUrl() {
 function getPair(item1, item2){
     if(socket !== null && socket.connected){
         const id = last_pair_id++;
-        socket.emit('pair', {pair: [item1.name, item2.name], id});
+        const ref = (item) => item.name in item_ids ? item_ids[item.name] : item.name;
+        socket.emit('pair', {pair: [ref(item1), ref(item2)], id});
         waiting_pairs[id] = [item1, item2];
         return true;
     }
     return false;
 }
 
+function releasePair(pair_id){
+    if(!(pair_id in waiting_pairs)){
+        return;
+    }
+    let item1 = waiting_pairs[pair_id][0];
+    let item2 = waiting_pairs[pair_id][1];
+    delete waiting_pairs[pair_id];
+    item1.pairing = false;
+    item2.pairing = false;
+    item1.classList.remove('opacity-50');
+    item2.classList.remove('opacity-50');
+}
+
+function replaceItemButtons(list){
+    for(let key in item_buttons){
+        if(!list.some(item => item.name === key)){
+            item_buttons[key].remove();
+            delete item_buttons[key];
+        }
+    }
+    addItemButtons(list);
+}
+
+function addItemButtons(list){
+    for(let item of list){
+        if(item.emoji !== undefined&&item.name !== undefined){
+            createItemButton(item.emoji,item.name);
+        }else{
+            console.log("item without emoji or name",item);
+        }
+    }
+}
+
 function parseServerData(data){ 
     //check if data has field type
     if(data.type === undefined){
@@ -41,10 +231,10 @@ function parseServerData(data){
                 return;
             }
             if(data.data.id in waiting_pairs){
-                let item1 = waiting_pairs[data.data.id][0];
-                let item2 = waiting_pairs[data.data.id][1];
-                delete waiting_pairs[data.data.id];
                 if(data.data.new_item !== undefined && data.data.new_item != null){
+                    let item1 = waiting_pairs[data.data.id][0];
+                    let item2 = waiting_pairs[data.data.id][1];
+                    delete waiting_pairs[data.data.id];
                     if(data.data.new_item.emoji !== undefined&&data.data.new_item.name !== undefined){
                     console.log("pair result with new item");
                     createItem(
@@ -60,13 +250,33 @@ function parseServerData(data){
                     }
                 }else{
                     console.log("pair result without new item");
-                    item1.pairing = false;
-                    item2.pairing = false;
-                    item1.classList.remove('opacity-50');
-                    item2.classList.remove('opacity-50');
+                    releasePair(data.data.id);
                 }
             }
             break;
+        case "pair_pending":
+            if(data.data !== undefined && data.data.id in waiting_pairs){
+                console.log("pair pending as request "+data.data.request_id);
+            }
+            break;
+        case "rate_limited":
+            if(data.data !== undefined){
+                console.log("rate limited: "+data.data.event+", retry in "+data.data.retry_after+"s");
+                if(data.data.id !== undefined && data.data.id !== null){
+                    releasePair(data.data.id);
+                }
+                if(data.data.event === 'items_resync' && items_resync_pending){
+                    // Still out of date; ask again once the server allows it
+                    requestItemsResync(data.data.retry_after || 1);
+                }
+            }
+            break;
+        case "pair_timeout":
+            if(data.data !== undefined){
+                console.log("pair timed out");
+                releasePair(data.data.id);
+            }
+            break;
         case "mode":
             if(data.data !== undefined){
                 setStatus(data.data);
@@ -80,30 +290,109 @@ function parseServerData(data){
         case "clear":
             clearItems();
             break;
+        case "state":
+            // Snapshot on join or gamemode switch; applied in one go so no partial state is rendered
+            if(Array.isArray(data.data)){
+                for(const part of data.data){
+                    try {
+                        parseServerData(part);
+                    } catch (error) {
+                        console.log('Could not apply state part '+part?.type, error);
+                    }
+                }
+            }
+            break;
         case "items":
             if(data.data !== undefined){
-                for(let key in item_buttons){
-                    if(!data.data.some(item => item.name === key)){
-                        item_buttons[key].remove();
-                        delete item_buttons[key];
-                    }
+                replaceItemButtons(data.data);
+                known_items = data.data;
+                items_version = data.version !== undefined ? data.version : null;
+                items_hash = data.hash || null;
+                items_resync_pending = false;
+                clearTimeout(items_resync_timer);
+                items_resync_timer = null;
+                storeItems();
+            }
+            break;
+        case "items_up_to_date":
+            if(data.data !== undefined){
+                items_version = data.data.version;
+                items_hash = data.data.hash;
+            }
+            break;
+        case "items_add":
+            if(data.data === undefined){
+                return;
+            }
+            if(items_version === null || data.data.from !== items_version){
+                items_version = null;
+                if(!items_resync_pending){
+                    console.log("item list out of date, requesting full list");
+                    requestItemsResync(0);
                 }
-                for(let item of data.data){
-                    if(item.emoji !== undefined&&item.name !== undefined){
-                        createItemButton(item.emoji,item.name);
-                    }else{
-                        console.log("item without emoji or name",item);
+                return;
+            }
+            addItemButtons(data.data.items);
+            known_items = known_items.concat(data.data.items);
+            items_version = data.data.version;
+            items_hash = data.data.hash || null;
+            storeItems();
+            break;
+        case "item_update":
+            if(data.data !== undefined && data.data.name !== undefined && data.data.emoji !== undefined){
+                updateItemEmoji(data.data.name, data.data.emoji);
+                for(let item of known_items){
+                    if(item.name === data.data.name){
+                        item.emoji = data.data.emoji;
                     }
                 }
+                // The server's hash covers emoji, so ours no longer matches until the next full list
+                items_hash = null;
+                storeItems();
             }
             break;
         case "users":
-            updateUserList(data.data);
+            if(Array.isArray(data.data)){
+                user_list = data.data;
+                updateUserList(user_list);
+            }
+            break;
+        case "users_join":
+            if(Array.isArray(data.data)){
+                // Deltas may repeat what a full list already said, so merge by uuid
+                const joined = new Map(data.data.map(user => [user.uuid, user]));
+                user_list = user_list.map(user => joined.get(user.uuid) || user);
+                for(const user of joined.values()){
+                    if(!user_list.some(known => known.uuid === user.uuid)){
+                        user_list.push(user);
+                    }
+                }
+                updateUserList(user_list);
+            }
+            break;
+        case "users_leave":
+            if(Array.isArray(data.data)){
+                const left = new Set(data.data);
+                user_list = user_list.filter(user => !left.has(user.uuid));
+                updateUserList(user_list);
+            }
+            break;
+        case "identity":
+            my_uuid = data.data;
             break;
         case "bingo":
-            setBingoField(data.data);
+            bingo_field = data.data;
+            renderBingoField();
+            break;
+        case "bingo_cell":
+            if(bingo_field && Array.isArray(bingo_field.cells) && data.data && bingo_field.cells[data.data.index]){
+                const {index, ...cell} = data.data;
+                bingo_field.cells[index] = {...bingo_field.cells[index], ...cell};
+                renderBingoField();
+            }
             break;
         case "hide_bingo":
+            bingo_field = null;
             hideBingo();
             break;
         case "timer":
@@ -164,14 +453,18 @@ function connectToServer(name){
         reconnectionDelayMax: 3000,
     });
 
-    socket.on('connect', () => {
+    socket.on('connect', async () => {
         setConnStatus(2);
-        socket.emit('join', {});
+        // Ids are per server process; the new session sends its own dictionary
+        item_dict = {};
+        item_ids = {};
+        await items_restored;
+        socket.emit('join', joinPayload());
     });
 
     socket.on('server_message', (payload) => {
         try {
-            parseServerData(payload);
+            parseServerData(expandCompact(payload));
         } catch (error) {
             console.log('Could not parse payload', error);
         }
@@ -189,6 +482,7 @@ function connectToServer(name){
 document.addEventListener('DOMContentLoaded', function() {
     console.log("DOMContentLoaded event");
     initClient(getPair, () => {}, handleBingoClick);
+    items_restored = restoreItems().catch((error) => console.log('Could not restore items', error));
 })
 
 window.addEventListener('load', function() {